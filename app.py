@@ -11,25 +11,47 @@ Versão 5.0 - Novas funcionalidades:
 - Upload em Lote de múltiplos arquivos
 """
 
+import hashlib
+import logging
+
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from pathlib import Path
 from io import BytesIO
-import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import atexit
 import os
+import re
+import tempfile
+import zipfile
+
+try:
+    # DEFLATE acelerado por SIMD (python-isal), se instalado; a API é a
+    # mesma do zlib, então o zipfile usa o compressor mais rápido
+    from isal import isal_zlib as _isal_zlib
+    zipfile.zlib = _isal_zlib
+except ImportError:
+    pass
 from typing import Dict, List, Tuple, Optional
+from collections import defaultdict
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 # Importa módulos do projeto
 from exceptions import SpedError
 from sped_parser import SpedParser, SpedDataProcessor
 
 # Importa layouts específicos
-from layouts_icms_ipi import LAYOUTS_ICMS_IPI, NUMERIC_COLUMNS_ICMS_IPI, GROUPS_ICMS_IPI
-from layouts_contribuicoes import LAYOUTS_CONTRIBUICOES, NUMERIC_COLUMNS_CONTRIBUICOES, GROUPS_CONTRIBUICOES
+from layouts_icms_ipi import (
+    LAYOUTS_ICMS_IPI, NUMERIC_COLUMNS_ICMS_IPI, GROUPS_ICMS_IPI,
+    CATEGORICAL_COLUMNS_ICMS_IPI
+)
+from layouts_contribuicoes import (
+    LAYOUTS_CONTRIBUICOES, NUMERIC_COLUMNS_CONTRIBUICOES, GROUPS_CONTRIBUICOES,
+    CATEGORICAL_COLUMNS_CONTRIBUICOES
+)
 
 # =========================
 # CONFIGURAÇÃO DA PÁGINA
@@ -42,8 +64,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# CSS customizado
-st.markdown("""
+# CSS customizado (constante de módulo: não é re-interpolado a cada rerun)
+_PAGE_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -96,32 +118,62 @@ st.markdown("""
         font-size: 1.8rem;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# O CSS precisa ser emitido em toda execução: o Streamlit descarta os
+# elementos que não forem reemitidos no rerun, então um gate "uma vez por
+# sessão" deixaria a página sem estilo a partir da primeira interação.
+# A constante pré-montada evita ao menos reconstruir a string por rerun.
+st.markdown(_PAGE_CSS, unsafe_allow_html=True)
 
 
 # =========================
 # FUNÇÕES AUXILIARES
 # =========================
 
-def detect_efd_type(file_content: bytes) -> str:
-    """Detecta automaticamente o tipo de EFD pelo registro 0000."""
+# Marcadores de abertura usados no sniff do tipo de EFD, compilados em um
+# único autômato: uma varredura linear decide, em vez de três buscas `in`
+_EFD_SNIFF_RE = re.compile(rb'\|(0000|A001|M100)\|')
+
+
+def detect_efd_type(data: bytes) -> str:
+    """
+    Detecta automaticamente o tipo de EFD pelo registro 0000.
+
+    Varre os bytes inteiros com a regex compilada (uma única passada em C,
+    sem decodificar): os marcadores A001/M100 só aparecem depois do bloco 0
+    inteiro, e os registros 0150/0200/0400 de uma empresa média passam fácil
+    de qualquer limite fixo de prefixo — um probe truncado classificava
+    Contribuições como ICMS/IPI em silêncio.
+    """
     try:
-        content = file_content.decode('latin-1', errors='ignore')
-        for line in content.split('\n')[:10]:
-            if '|0000|' in line:
-                if '|A001|' in content or '|M100|' in content:
-                    return 'CONTRIBUICOES'
-                return 'ICMS_IPI'
+        saw_0000 = False
+        for m in _EFD_SNIFF_RE.finditer(data):
+            if m.group(1) == b'0000':
+                saw_0000 = True
+            elif saw_0000:
+                # A001/M100 só existem na EFD Contribuições
+                return 'CONTRIBUICOES'
         return 'ICMS_IPI'
-    except:
+    except Exception:
         return 'ICMS_IPI'
 
 
 def get_layout_config(efd_type: str):
     """Retorna configuração de layout baseado no tipo de EFD."""
     if efd_type == 'CONTRIBUICOES':
-        return LAYOUTS_CONTRIBUICOES, NUMERIC_COLUMNS_CONTRIBUICOES, GROUPS_CONTRIBUICOES
-    return LAYOUTS_ICMS_IPI, NUMERIC_COLUMNS_ICMS_IPI, GROUPS_ICMS_IPI
+        return (LAYOUTS_CONTRIBUICOES, NUMERIC_COLUMNS_CONTRIBUICOES,
+                GROUPS_CONTRIBUICOES, CATEGORICAL_COLUMNS_CONTRIBUICOES)
+    return (LAYOUTS_ICMS_IPI, NUMERIC_COLUMNS_ICMS_IPI,
+            GROUPS_ICMS_IPI, CATEGORICAL_COLUMNS_ICMS_IPI)
+
+
+# Itens dos grupos pré-materializados por tipo de EFD (evita reconstruir a
+# view dict.items() a cada upload/rerun)
+_GROUP_ITEMS = {
+    'CONTRIBUICOES': tuple(GROUPS_CONTRIBUICOES.items()),
+    'ICMS_IPI': tuple(GROUPS_ICMS_IPI.items()),
+}
 
 
 def format_currency(value: float) -> str:
@@ -136,91 +188,179 @@ def format_currency(value: float) -> str:
 def process_sped_file(uploaded_file, efd_type: str) -> Tuple[dict, dict, object]:
     """
     Processa um arquivo SPED e retorna os DataFrames consolidados e brutos.
+
+    Delega para a versão cacheada, chaveada pelo conteúdo do arquivo: reruns
+    do Streamlit (clicar em download, mexer em widgets) reutilizam o resultado
+    sem refazer o parse.
     """
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.txt') as tmp:
-        tmp.write(uploaded_file.getvalue())
-        tmp_path = Path(tmp.name)
-    
+    uploaded_file.seek(0)
+    return _process_sped_cached(uploaded_file.getvalue(), uploaded_file.name, efd_type)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _process_sped_cached(file_bytes: bytes, file_name: str, efd_type: str,
+                         _progress_callback=None) -> Tuple[dict, dict, object]:
+    """
+    Processa o conteúdo de um arquivo SPED (memoizado por hash dos bytes).
+
+    O prefixo `_` no callback faz o Streamlit ignorá-lo na chave do cache.
+    """
+    return _process_sped_bytes(file_bytes, file_name, efd_type,
+                               progress_callback=_progress_callback)
+
+
+def _sped_cache_key(file_bytes: bytes, efd_type: str) -> str:
+    """Chave de cache por conteúdo: hash BLAKE2b dos bytes + tipo de EFD."""
+    return f"{efd_type}:{hashlib.blake2b(file_bytes, digest_size=16).hexdigest()}"
+
+
+def _process_sped_bytes(file_bytes: bytes, file_name: str, efd_type: str,
+                        progress_callback=None) -> Tuple[dict, dict, object]:
+    """
+    Processa o conteúdo de um arquivo SPED.
+
+    Função de módulo sem estado do Streamlit: também serve de worker para o
+    pool de processos do lote de uploads.
+    """
+    layouts, numeric_cols, groups, categorical_cols = get_layout_config(efd_type)
+
+    parser = SpedParser.from_stream(
+        BytesIO(file_bytes), name=file_name,
+        layouts=layouts, numeric_columns=numeric_cols, groups=groups
+    )
+    dataframes = parser.parse(progress_callback=progress_callback)
+
+    dataframes = SpedDataProcessor.convert_dataframes(dataframes, numeric_columns=numeric_cols)
+
+    # Strings em buffers Arrow contíguos em vez de um PyObject por célula:
+    # merges/groupbys mais rápidos e bem menos RAM nos blocos grandes
     try:
-        layouts, numeric_cols, groups = get_layout_config(efd_type)
-        
-        parser = SpedParser(tmp_path, layouts=layouts, numeric_columns=numeric_cols, groups=groups)
-        dataframes = parser.parse()
-        
-        dataframes = SpedDataProcessor.convert_dataframes(dataframes)
-        
-        consolidated = {}
-        
-        for group_name, group_config in groups.items():
-            parent_code, child_codes, parent_idx, header_idx, header_code = group_config
-            
-            if parent_code not in dataframes or dataframes[parent_code].empty:
-                continue
-            
-            consolidated_df = SpedDataProcessor.consolidate_group_new(
-                dataframes, parent_code, child_codes, parent_idx,
-                numeric_columns=numeric_cols
-            )
-            
-            if not consolidated_df.empty:
-                if header_code in dataframes and not dataframes[header_code].empty:
-                    header_df = dataframes.get(header_code)
-                    try:
-                        consolidated_df = SpedDataProcessor.attach_header(
-                            consolidated_df,
-                            header_df,
-                            header_idx,
-                            f'{header_code}_'
-                        )
-                    except Exception:
-                        pass
-                
-                consolidated_df.drop(
-                    columns=[parent_idx, header_idx],
-                    errors='ignore',
-                    inplace=True
+        for code in dataframes:
+            dataframes[code] = dataframes[code].convert_dtypes(dtype_backend='pyarrow')
+    except (ImportError, TypeError):
+        pass  # pandas sem suporte a pyarrow: segue com dtypes NumPy
+
+    # Códigos repetidos (CFOP, CST, indicadores...) viram category: chaves de
+    # merge muito menores e menos memória até a exportação
+    for df in dataframes.values():
+        for col in categorical_cols:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+
+    # Os grupos tocam registros disjuntos e `dataframes` é só leitura nesta
+    # fase, então a consolidação roda em paralelo (merge/concat do pandas
+    # liberam o GIL nas operações em C)
+    group_items = _GROUP_ITEMS.get(efd_type, _GROUP_ITEMS['ICMS_IPI'])
+    pending = []
+    for group_name, group_config in group_items:
+        parent_df = dataframes.get(group_config[0])
+        if parent_df is not None and not parent_df.empty:
+            pending.append((group_name, group_config))
+
+    consolidated = {}
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(8, len(pending))) as pool:
+            futures = {
+                pool.submit(_consolidate_group, group_config, dataframes, numeric_cols): group_name
+                for group_name, group_config in pending
+            }
+            results = {futures[f]: f.result() for f in as_completed(futures)}
+
+        # Preserva a ordem de declaração dos grupos nas planilhas
+        for group_name, _ in pending:
+            consolidated[f'{group_name}_CONSOLIDADO'] = results[group_name]
+
+    return consolidated, dataframes, parser.metrics
+
+
+def _consolidate_group(group_config, dataframes: dict, numeric_cols: dict) -> pd.DataFrame:
+    """Consolida um único grupo (pai + filhos + cabeçalho) — corpo do loop paralelo."""
+    parent_code, child_codes, parent_idx, header_idx, header_code = group_config
+
+    consolidated_df = SpedDataProcessor.consolidate_group_new(
+        dataframes, parent_code, child_codes, parent_idx,
+        numeric_columns=numeric_cols
+    )
+
+    if not consolidated_df.empty:
+        header_df = dataframes.get(header_code)
+        if header_df is not None and not header_df.empty:
+            try:
+                consolidated_df = SpedDataProcessor.attach_header(
+                    consolidated_df,
+                    header_df,
+                    header_idx,
+                    f'{header_code}_'
                 )
-            
-            consolidated[f'{group_name}_CONSOLIDADO'] = consolidated_df
-        
-        return consolidated, dataframes, parser.metrics
-        
-    finally:
-        if tmp_path.exists():
-            os.unlink(tmp_path)
+            except Exception:
+                pass
+
+        consolidated_df.drop(
+            columns=[parent_idx, header_idx],
+            errors='ignore',
+            inplace=True
+        )
+
+    return consolidated_df
+
+
+def _fast_ddmmyyyy(series: pd.Series) -> pd.Series:
+    """
+    Decodifica datas DDMMYYYY de largura fixa sem passar pelo strptime.
+
+    O SPED sempre grava datas nesse formato, então dá para fatiar as
+    substrings de dia/mês/ano de uma vez e montar o datetime64 por
+    aritmética de unidades do numpy. Valores fora do formato viram NaT,
+    como no pd.to_datetime(errors='coerce').
+    """
+    s = series.astype('string')
+    ok = (s.str.len().eq(8) & s.str.isdigit()).to_numpy(dtype=bool, na_value=False)
+
+    day = pd.to_numeric(s.str.slice(0, 2), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    month = pd.to_numeric(s.str.slice(2, 4), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    year = pd.to_numeric(s.str.slice(4, 8), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+    with np.errstate(invalid='ignore'):
+        ok &= (day >= 1) & (day <= 31) & (month >= 1) & (month <= 12)
+
+    d = np.where(ok, day, 1).astype('int64')
+    m = np.where(ok, month, 1).astype('int64')
+    y = np.where(ok, year, 1970).astype('int64')
+
+    out = ((y - 1970).astype('datetime64[Y]') + (m - 1).astype('timedelta64[M]'))
+    out = out.astype('datetime64[D]') + (d - 1).astype('timedelta64[D]')
+
+    # Dia inexistente no mês (29/02 em ano comum, 31/04...) transborda para o
+    # mês seguinte na aritmética acima; se o mês resultante não é o pedido,
+    # a data era inválida e vira NaT, como no pd.to_datetime(errors='coerce')
+    ok &= out.astype('datetime64[M]').astype('int64') == (y - 1970) * 12 + (m - 1)
+    out[~ok] = np.datetime64('NaT')
+
+    return pd.Series(out.astype('datetime64[ns]'), index=series.index)
 
 
 def apply_filters(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
     """
     Aplica filtros ao DataFrame.
+
+    Só produz seleções booleanas (nenhuma coluna do original é mutada),
+    então não há cópia defensiva: com filtros vazios o próprio `df` volta.
     """
-    filtered_df = df.copy()
-    
-    # Filtro por período
-    if filters.get('dt_inicio') and 'DT_DOC' in filtered_df.columns:
-        try:
-            filtered_df['DT_DOC_PARSED'] = pd.to_datetime(
-                filtered_df['DT_DOC'], format='%d%m%Y', errors='coerce'
-            )
-            filtered_df = filtered_df[
-                filtered_df['DT_DOC_PARSED'] >= pd.to_datetime(filters['dt_inicio'])
-            ]
-            filtered_df = filtered_df.drop(columns=['DT_DOC_PARSED'])
-        except:
-            pass
-    
-    if filters.get('dt_fim') and 'DT_DOC' in filtered_df.columns:
-        try:
-            filtered_df['DT_DOC_PARSED'] = pd.to_datetime(
-                filtered_df['DT_DOC'], format='%d%m%Y', errors='coerce'
-            )
-            filtered_df = filtered_df[
-                filtered_df['DT_DOC_PARSED'] <= pd.to_datetime(filters['dt_fim'])
-            ]
-            filtered_df = filtered_df.drop(columns=['DT_DOC_PARSED'])
-        except:
-            pass
-    
+    filtered_df = df
+
+    # Filtro por período: DT_DOC é parseado uma única vez e os dois limites
+    # viram uma única máscara booleana (antes eram dois parses completos)
+    dt_inicio = filters.get('dt_inicio')
+    dt_fim = filters.get('dt_fim')
+    if (dt_inicio or dt_fim) and 'DT_DOC' in filtered_df.columns:
+        parsed = _fast_ddmmyyyy(filtered_df['DT_DOC'])
+        mask = pd.Series(True, index=filtered_df.index)
+        if dt_inicio:
+            mask &= parsed >= pd.Timestamp(dt_inicio)
+        if dt_fim:
+            mask &= parsed <= pd.Timestamp(dt_fim)
+        filtered_df = filtered_df[mask]
+
     # Filtro por CFOP
     if filters.get('cfops') and 'CFOP' in filtered_df.columns:
         filtered_df = filtered_df[filtered_df['CFOP'].isin(filters['cfops'])]
@@ -229,69 +369,293 @@ def apply_filters(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
     if filters.get('ind_oper') is not None and 'IND_OPER' in filtered_df.columns:
         filtered_df = filtered_df[filtered_df['IND_OPER'] == filters['ind_oper']]
     
-    # Filtro por CNPJ participante
+    # Filtro por CNPJ participante: regex=False despacha para busca literal
+    # de substring em C, sem compilar um padrão por varredura
     if filters.get('cnpj_part') and 'COD_PART' in filtered_df.columns:
-        filtered_df = filtered_df[
-            filtered_df['COD_PART'].str.contains(filters['cnpj_part'], na=False)
-        ]
+        termo = filters['cnpj_part'].strip()
+        col = filtered_df['COD_PART'].astype('string')
+        if termo.isdigit():
+            # Consulta só com dígitos (caso comum de CNPJ): remove a
+            # pontuação da coluna para casar qualquer formatação
+            col = col.str.replace(r'\D', '', regex=True)
+        filtered_df = filtered_df[col.str.contains(termo, na=False, regex=False)]
     
     return filtered_df
 
 
-def process_multiple_files(uploaded_files: list, efd_type: str, progress_bar) -> Tuple[dict, dict, list]:
+def process_multiple_files(file_blobs: list, efd_type: str, progress_bar) -> Tuple[dict, dict, list]:
     """
-    Processa múltiplos arquivos SPED.
+    Processa múltiplos arquivos SPED a partir de tuplas (nome, bytes).
+
+    Receber os bytes já lidos evita chamar UploadedFile.getvalue() mais de
+    uma vez por arquivo (cada chamada copia o buffer inteiro). Com mais de
+    um arquivo, cada um é processado em um processo worker (parse +
+    consolidação são CPU-bound); os resultados são mesclados na ordem
+    original do upload.
     """
-    all_consolidated = {}
-    all_raw = {}
     all_metrics = []
-    
-    for idx, uploaded_file in enumerate(uploaded_files):
-        progress_bar.progress(
-            (idx / len(uploaded_files)),
-            text=f"Processando {uploaded_file.name}..."
-        )
-        
-        consolidated, raw, metrics = process_sped_file(uploaded_file, efd_type)
-        
+
+    if len(file_blobs) > 1:
+        # Cache por conteúdo na sessão: re-clicar em "Processar" com os mesmos
+        # arquivos (ou com um arquivo novo no lote) só paga pelo que mudou
+        sped_cache = st.session_state.setdefault('_sped_cache', {})
+        keys = [_sped_cache_key(data, efd_type) for _, data in file_blobs]
+        results = [sped_cache.get(key) for key in keys]
+
+        pending = [idx for idx, r in enumerate(results) if r is None]
+        if pending:
+            with ProcessPoolExecutor(max_workers=min(len(pending), os.cpu_count() or 1)) as pool:
+                futures = {
+                    pool.submit(_process_sped_bytes, file_blobs[idx][1],
+                                file_blobs[idx][0], efd_type): idx
+                    for idx in pending
+                }
+                done = len(file_blobs) - len(pending)
+                for fut in as_completed(futures):
+                    idx = futures[fut]
+                    results[idx] = fut.result()
+                    sped_cache[keys[idx]] = results[idx]
+                    done += 1
+                    progress_bar.progress(
+                        done / len(file_blobs),
+                        text=f"Processados {done} de {len(file_blobs)} arquivo(s)..."
+                    )
+
+        # Poda para o lote atual: sem limite, cada arquivo já processado na
+        # sessão ficaria pinado (consolidado + brutos) até o fim dela
+        st.session_state['_sped_cache'] = {key: sped_cache[key] for key in keys}
+    else:
+        # Arquivo único: progresso real reportado pelo parser, limitado a
+        # uma atualização a cada 250 ms (cada st.progress é um round trip)
+        name, data = file_blobs[0]
+        progress_bar.progress(0.0, text=f"Processando {name}...")
+        results = [_process_sped_cached(
+            data, name, efd_type,
+            _progress_callback=lambda frac, msg: progress_bar.progress(
+                min(frac, 1.0), text=f"{name}: {msg}"
+            )
+        )]
+
+    # Acumula listas por chave e concatena UMA vez no final: concat
+    # incremental recopia o DataFrame crescente a cada arquivo (O(N²))
+    buckets_consolidated = defaultdict(list)
+    buckets_raw = defaultdict(list)
+
+    for (name, _), (consolidated, raw, metrics) in zip(file_blobs, results):
         for key, df in consolidated.items():
-            if key not in all_consolidated:
-                all_consolidated[key] = df
-            else:
-                all_consolidated[key] = pd.concat([all_consolidated[key], df], ignore_index=True)
-        
+            buckets_consolidated[key].append(df)
+
         for key, df in raw.items():
-            if key not in all_raw:
-                all_raw[key] = df
-            else:
-                all_raw[key] = pd.concat([all_raw[key], df], ignore_index=True)
-        
+            buckets_raw[key].append(df)
+
         all_metrics.append({
-            'arquivo': uploaded_file.name,
+            'arquivo': name,
             'linhas': metrics.processed_lines,
             'sucesso': metrics.taxa_sucesso,
             'tempo': metrics.tempo_processamento
         })
+
+    all_consolidated = {
+        key: dfs[0] if len(dfs) == 1 else pd.concat(dfs, ignore_index=True, copy=False)
+        for key, dfs in buckets_consolidated.items()
+    }
+    all_raw = {
+        key: dfs[0] if len(dfs) == 1 else pd.concat(dfs, ignore_index=True, copy=False)
+        for key, dfs in buckets_raw.items()
+    }
     
     progress_bar.progress(1.0, text="Concluído!")
     
     return all_consolidated, all_raw, all_metrics
 
 
-def create_excel_download(dataframes: dict) -> bytes:
-    """Cria arquivo Excel em memória para download."""
+def _write_single_sheet_xlsx(sheet_name: str, df: pd.DataFrame) -> bytes:
+    """
+    Serializa um DataFrame como workbook xlsx de planilha única.
+
+    As linhas são gravadas manualmente, em ordem, via write_row: o
+    constant_memory descarta escritas em linhas já despejadas, e o
+    df.to_excel grava o corpo coluna a coluna — combinar os dois perderia
+    tudo menos a última linha de cada coluna a partir da segunda.
+    """
+    buf = BytesIO()
+    with pd.ExcelWriter(
+        buf,
+        engine='xlsxwriter',
+        engine_kwargs={'options': {
+            'constant_memory': True,
+            'strings_to_numbers': False,
+            'default_date_format': 'dd/mm/yyyy',
+        }}
+    ) as writer:
+        worksheet = writer.book.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, [str(c) for c in df.columns])
+
+        # dtype=object desempacota os escalares numpy/Arrow em tipos Python,
+        # que o xlsxwriter sabe gravar; NaN/NaT viram célula em branco
+        values = df.to_numpy(dtype=object)
+        if values.size:
+            mask = pd.isna(values)
+            if mask.any():
+                values[mask] = None
+        for row_num, row in enumerate(values, start=1):
+            worksheet.write_row(row_num, 0, row.tolist())
+    return buf.getvalue()
+
+
+def _merge_single_sheet_xlsx(parts: List[Tuple[str, bytes]], output_path: str) -> None:
+    """
+    Funde workbooks de planilha única em um único xlsx.
+
+    Usa o primeiro workbook como base e acrescenta os worksheets dos demais,
+    remendando workbook.xml, os relacionamentos e os content-types. Só é
+    válido porque o _write_single_sheet_xlsx grava em constant_memory, que
+    emite strings inline — células t="s" apontariam para a sharedStrings do
+    próprio workbook de origem, que este remendo não funde. A premissa é
+    verificada planilha a planilha; se alguma violar, aborta e o chamador
+    cai no writer sequencial.
+    """
+    base_name, base_bytes = parts[0]
+    sheet_entries = []
+    rel_entries = []
+    type_entries = []
+    extra_sheets = []
+
+    part_xmls = []
+    for sheet_name, part_bytes in parts:
+        with zipfile.ZipFile(BytesIO(part_bytes)) as zf:
+            xml = zf.read('xl/worksheets/sheet1.xml')
+        if b' t="s"' in xml:
+            raise ValueError(
+                f"planilha '{sheet_name}' usa sharedStrings; fusão inválida"
+            )
+        part_xmls.append(xml)
+
+    for n, (sheet_name, _), xml in zip(range(2, len(parts) + 1), parts[1:], part_xmls[1:]):
+        extra_sheets.append((f'xl/worksheets/sheet{n}.xml', xml))
+        safe = sheet_name.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+        sheet_entries.append(f'<sheet name="{safe}" sheetId="{n}" r:id="rId{n}"/>')
+        rel_entries.append(
+            f'<Relationship Id="rId{n}" '
+            f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{n}.xml"/>'
+        )
+        type_entries.append(
+            f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        )
+
+    # compresslevel=1: deflate rápido — o xlsx final é um pouco maior, mas
+    # a recompressão deixa de dominar o tempo de geração em planilhas grandes
+    with zipfile.ZipFile(BytesIO(base_bytes)) as src, \
+            zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as dst:
+        for item in src.namelist():
+            data = src.read(item)
+            if item == 'xl/workbook.xml':
+                # Os rIds dos demais recursos (styles, theme) vêm depois dos
+                # worksheets nos rels; renumera apenas acrescentando no fim
+                data = data.replace(b'</sheets>', ''.join(sheet_entries).encode() + b'</sheets>')
+            elif item == 'xl/_rels/workbook.xml.rels':
+                # Desloca os rIds não-worksheet para depois dos novos sheets
+                offset = len(parts) - 1
+                data = re.sub(
+                    rb'Id="rId(\d+)"',
+                    lambda m: b'Id="rId%d"' % (int(m.group(1)) + offset) if int(m.group(1)) > 1 else m.group(0),
+                    data
+                )
+                data = data.replace(b'</Relationships>', ''.join(rel_entries).encode() + b'</Relationships>')
+            elif item == '[Content_Types].xml':
+                data = data.replace(b'</Types>', ''.join(type_entries).encode() + b'</Types>')
+            dst.writestr(item, data)
+        for arcname, xml in extra_sheets:
+            dst.writestr(arcname, xml)
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def create_parquet_download(dataframes: dict) -> bytes:
+    """
+    Cria um zip com um arquivo Parquet por bloco consolidado.
+
+    Formato colunar e comprimido: ordens de grandeza mais rápido de gravar e
+    de reler programaticamente do que o xlsx equivalente.
+    """
     output = BytesIO()
-    
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+
+    # ZIP_STORED: o Parquet já sai comprimido (snappy), recomprimir só custa CPU
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as zf:
         for sheet_name, df in dataframes.items():
             if df is not None and not df.empty:
-                safe_name = sheet_name[:31]
-                df.to_excel(writer, sheet_name=safe_name, index=False)
-    
-    output.seek(0)
+                buf = BytesIO()
+                df.to_parquet(buf, engine='pyarrow', index=False)
+                zf.writestr(f'{sheet_name}.parquet', buf.getvalue())
+
     return output.getvalue()
 
 
+def _new_download_tmpfile(suffix: str) -> str:
+    """Cria um arquivo temporário de download, removido na saída do processo."""
+    tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    tmp.close()
+    atexit.register(_unlink_quiet, tmp.name)
+    return tmp.name
+
+
+def _unlink_quiet(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def create_excel_download(dataframes: dict) -> str:
+    """
+    Gera o Excel consolidado em um arquivo temporário e retorna o caminho.
+
+    Escrever em disco (em vez de devolver bytes num BytesIO) evita manter o
+    workbook inteiro pinado na sessão entre reruns — um consolidado grande
+    facilmente passa de 100 MB.
+    """
+    output_path = _new_download_tmpfile('.xlsx')
+
+    sheets = [
+        (sheet_name[:31], df)
+        for sheet_name, df in dataframes.items()
+        if df is not None and not df.empty
+    ]
+
+    try:
+        if not sheets:
+            raise ValueError("nenhuma planilha não-vazia")
+
+        # Serializa cada planilha em paralelo (zlib/xml liberam o GIL) e
+        # funde os workbooks de planilha única no resultado final
+        with ThreadPoolExecutor(max_workers=min(8, len(sheets))) as pool:
+            parts = list(zip(
+                [name for name, _ in sheets],
+                pool.map(lambda item: _write_single_sheet_xlsx(*item), sheets)
+            ))
+        if len(parts) == 1:
+            Path(output_path).write_bytes(parts[0][1])
+        else:
+            _merge_single_sheet_xlsx(parts, output_path)
+    except Exception:
+        # Fallback sequencial: um único writer, planilha a planilha. Sem
+        # constant_memory — o to_excel grava coluna a coluna, e esse modo só
+        # aceita escritas em ordem de linha
+        with pd.ExcelWriter(
+            output_path,
+            engine='xlsxwriter',
+            engine_kwargs={'options': {'strings_to_numbers': False}}
+        ) as writer:
+            for sheet_name, df in sheets:
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+            if not sheets:
+                pd.DataFrame().to_excel(writer, sheet_name='Vazio', index=False)
+
+    return output_path
+
+
 # =========================
 # DASHBOARD DE MÉTRICAS
 # =========================
@@ -355,8 +719,44 @@ def render_dashboard(consolidated: dict, raw_dataframes: dict):
         st.plotly_chart(fig_participants, use_container_width=True)
 
 
+# O dashboard re-renderiza a cada interação de widget, mas os DataFrames
+# consolidados no session_state são os mesmos objetos entre reruns: hashear
+# por identidade (id + len) evita rehashear milhões de linhas por repaint
+_DF_IDENTITY_HASH = {pd.DataFrame: lambda df: (id(df), len(df))}
+
+
+@st.cache_data(show_spinner=False, max_entries=64, hash_funcs=_DF_IDENTITY_HASH)
+def _cfop_agg(df: pd.DataFrame) -> pd.DataFrame:
+    """Soma de VL_DOC por CFOP de um bloco (agregado pequeno, cacheado)."""
+    # sort=False evita ordenar TODOS os grupos quando só o top-10 interessa;
+    # observed=True não materializa categorias ausentes no bloco
+    return df.groupby('CFOP', sort=False, observed=True)['VL_DOC'].sum().reset_index()
+
+
+@st.cache_data(show_spinner=False, max_entries=64, hash_funcs=_DF_IDENTITY_HASH)
+def _part_agg(df: pd.DataFrame) -> pd.DataFrame:
+    """Soma de VL_DOC por participante de um bloco (agregado cacheado)."""
+    return df.groupby('COD_PART', sort=False, observed=True)['VL_DOC'].sum().reset_index()
+
+
+@st.cache_data(show_spinner=False, max_entries=64, hash_funcs=_DF_IDENTITY_HASH)
+def _block_totals(df: pd.DataFrame) -> dict:
+    """Totais de um único bloco consolidado (cacheados por DataFrame)."""
+    col_map = (('VL_DOC', 'vl_total'), ('VL_ICMS', 'vl_icms'),
+               ('VL_PIS', 'vl_pis'), ('VL_COFINS', 'vl_cofins'))
+    cols = [col for col, _ in col_map if col in df.columns]
+    # Uma única redução vetorizada sobre as colunas presentes, em vez de
+    # um .sum() separado por coluna
+    sums = df[cols].sum(numeric_only=True) if cols else pd.Series(dtype='float64')
+
+    totals = {'total_docs': len(df)}
+    for col, key in col_map:
+        totals[key] = float(sums.get(col, 0.0))
+    return totals
+
+
 def calculate_totals(consolidated: dict) -> dict:
-    """Calcula totais dos dados consolidados."""
+    """Calcula totais dos dados consolidados somando os agregados por bloco."""
     totals = {
         'total_docs': 0,
         'vl_total': 0.0,
@@ -364,42 +764,39 @@ def calculate_totals(consolidated: dict) -> dict:
         'vl_pis': 0.0,
         'vl_cofins': 0.0
     }
-    
+
     for key, df in consolidated.items():
         if df is None or df.empty:
             continue
-        
-        totals['total_docs'] += len(df)
-        
-        if 'VL_DOC' in df.columns:
-            totals['vl_total'] += df['VL_DOC'].sum()
-        if 'VL_ICMS' in df.columns:
-            totals['vl_icms'] += df['VL_ICMS'].sum()
-        if 'VL_PIS' in df.columns:
-            totals['vl_pis'] += df['VL_PIS'].sum()
-        if 'VL_COFINS' in df.columns:
-            totals['vl_cofins'] += df['VL_COFINS'].sum()
-    
+        block = _block_totals(df)
+        for k in totals:
+            totals[k] += block[k]
+
     return totals
 
 
 def create_cfop_chart(consolidated: dict):
     """Cria gráfico de barras por CFOP."""
+    # Import tardio: plotly só é pago quando o dashboard renderiza um gráfico
+    import plotly.express as px
+
     cfop_data = []
     
     for key, df in consolidated.items():
         if df is None or df.empty:
             continue
         if 'CFOP' in df.columns and 'VL_DOC' in df.columns:
-            grouped = df.groupby('CFOP')['VL_DOC'].sum().reset_index()
-            grouped['Bloco'] = key.replace('_CONSOLIDADO', '')
-            cfop_data.append(grouped)
-    
+            cfop_data.append(_cfop_agg(df))
+
     if not cfop_data:
         return None
-    
+
+    # Concatena só os agregados por bloco (dezenas de linhas), não os frames
     all_cfop = pd.concat(cfop_data, ignore_index=True)
-    top_cfops = all_cfop.groupby('CFOP')['VL_DOC'].sum().nlargest(10).reset_index()
+    top_cfops = (
+        all_cfop.groupby('CFOP', sort=False, observed=True)['VL_DOC']
+        .sum().nlargest(10).reset_index()
+    )
     
     fig = px.bar(
         top_cfops,
@@ -423,6 +820,9 @@ def create_cfop_chart(consolidated: dict):
 
 def create_values_chart(totals: dict):
     """Cria gráfico de pizza com distribuição de valores."""
+    # Import tardio: plotly só é pago quando o dashboard renderiza um gráfico
+    import plotly.express as px
+
     values = [totals['vl_icms'], totals['vl_pis'], totals['vl_cofins']]
     labels = ['ICMS', 'PIS', 'COFINS']
     
@@ -452,20 +852,25 @@ def create_values_chart(totals: dict):
 
 def create_top_participants_chart(consolidated: dict):
     """Cria gráfico de top participantes por valor."""
+    # Import tardio: plotly só é pago quando o dashboard renderiza um gráfico
+    import plotly.express as px
+
     part_data = []
     
     for key, df in consolidated.items():
         if df is None or df.empty:
             continue
         if 'COD_PART' in df.columns and 'VL_DOC' in df.columns:
-            grouped = df.groupby('COD_PART')['VL_DOC'].sum().reset_index()
-            part_data.append(grouped)
-    
+            part_data.append(_part_agg(df))
+
     if not part_data:
         return None
-    
+
     all_parts = pd.concat(part_data, ignore_index=True)
-    top_parts = all_parts.groupby('COD_PART')['VL_DOC'].sum().nlargest(10).reset_index()
+    top_parts = (
+        all_parts.groupby('COD_PART', sort=False, observed=True)['VL_DOC']
+        .sum().nlargest(10).reset_index()
+    )
     
     if top_parts.empty:
         return None
@@ -496,19 +901,76 @@ def create_top_participants_chart(consolidated: dict):
 # PREVIEW DE DADOS
 # =========================
 
-def render_data_preview(consolidated: dict, raw_dataframes: dict, filters: dict):
-    """Renderiza preview dos dados em tabs."""
+def _search_columns(key: str, df: pd.DataFrame) -> list:
+    """
+    Colunas de texto pesquisáveis de um tab, calculadas uma vez por DataFrame.
+
+    O resultado fica no session_state chaveado por (id(df), len(df)): a cada
+    tecla o Streamlit re-executa o script, mas o DataFrame filtrado é o mesmo
+    objeto. O tamanho entra na chave porque um frame novo pode reaproveitar o
+    endereço de um já liberado.
+    """
+    cache_key = f'_search_cols_{key}'
+    ident = (id(df), len(df))
+    cached = st.session_state.get(cache_key)
+    if cached is not None and cached[0] == ident:
+        return cached[1]
+
+    cols = [
+        c for c in df.columns
+        if df[c].dtype == object
+        or pd.api.types.is_string_dtype(df[c])
+        or isinstance(df[c].dtype, pd.CategoricalDtype)
+    ]
+    st.session_state[cache_key] = (ident, cols)
+    return cols
+
+
+def _search_haystack(key: str, df: pd.DataFrame) -> pd.Series:
+    """
+    Coluna única de busca: colunas de texto concatenadas e em minúsculas.
+
+    Construída uma vez por DataFrame e cacheada no session_state — cada
+    tecla digitada vira um único contains literal sobre essa coluna, em vez
+    de varrer todas as colunas do frame novamente.
+    """
+    cache_key = f'_haystack_{key}'
+    ident = (id(df), len(df))
+    cached = st.session_state.get(cache_key)
+    if cached is not None and cached[0] == ident:
+        return cached[1]
+
+    cols = _search_columns(key, df)
+    if cols:
+        haystack = (
+            df[cols].astype('string').fillna('')
+            .agg(' '.join, axis=1)
+            .str.lower()
+        )
+    else:
+        haystack = pd.Series('', index=df.index, dtype='string')
+
+    st.session_state[cache_key] = (ident, haystack)
+    return haystack
+
+
+def render_data_preview(consolidated: dict, raw_dataframes: dict):
+    """
+    Renderiza preview dos dados em tabs.
+
+    Recebe os blocos já filtrados: os filtros da sidebar são aplicados uma
+    única vez no processamento, não de novo a cada render de tab.
+    """
     st.header("📋 Preview dos Dados")
-    
+
     # Cria tabs para cada bloco consolidado
     tabs_names = []
     tabs_data = []
-    
+
     for key, df in consolidated.items():
         if df is not None and not df.empty:
-            filtered_df = apply_filters(df, filters)
-            tabs_names.append(f"{key.replace('_CONSOLIDADO', '')} ({len(filtered_df):,})")
-            tabs_data.append((key, filtered_df))
+            tabs_names.append(f"{key.replace('_CONSOLIDADO', '')} ({len(df):,})")
+            tabs_data.append((key, df))
     
     if not tabs_names:
         st.warning("Nenhum dado consolidado para exibir.")
@@ -518,35 +980,46 @@ def render_data_preview(consolidated: dict, raw_dataframes: dict, filters: dict)
     
     for tab, (key, df) in zip(tabs, tabs_data):
         with tab:
-            # Busca
-            search_term = st.text_input(
-                "🔍 Buscar nos dados:",
-                key=f"search_{key}",
-                placeholder="Digite para buscar em todas as colunas..."
-            )
-            
+            # Busca + paginação dentro de um st.form: o rerun só acontece no
+            # submit, então N teclas digitadas custam UMA re-execução dos
+            # filtros/agregados em vez de uma por tecla
+            with st.form(f"search_form_{key}"):
+                search_term = st.text_input(
+                    "🔍 Buscar nos dados:",
+                    key=f"search_{key}",
+                    placeholder="Digite para buscar em todas as colunas..."
+                )
+                col1, col2, col3 = st.columns([1, 2, 1])
+                with col2:
+                    page = st.number_input(
+                        "Página",
+                        min_value=1,
+                        value=1,
+                        key=f"page_{key}"
+                    )
+                st.form_submit_button("Aplicar", use_container_width=True)
+
+
             if search_term:
-                mask = df.astype(str).apply(
-                    lambda x: x.str.contains(search_term, case=False, na=False)
-                ).any(axis=1)
+                # Um único contains literal sobre a coluna de busca
+                # pré-computada, em vez de varrer coluna a coluna por tecla
+                haystack = _search_haystack(key, df)
+                mask = haystack.str.contains(
+                    search_term.lower(), regex=False, na=False
+                ).to_numpy(dtype=bool, na_value=False)
                 display_df = df[mask]
             else:
                 display_df = df
-            
-            # Paginação
+
+            # Índice posicional: o iloc da paginação vira um slice puro de
+            # range, sem lookup no índice herdado dos filtros
+            display_df = display_df.reset_index(drop=True)
+
+            # Paginação (divisão com teto, sem branch)
             page_size = 50
-            total_pages = max(1, len(display_df) // page_size + (1 if len(display_df) % page_size else 0))
-            
-            col1, col2, col3 = st.columns([1, 2, 1])
-            with col2:
-                page = st.number_input(
-                    f"Página (1-{total_pages})",
-                    min_value=1,
-                    max_value=total_pages,
-                    value=1,
-                    key=f"page_{key}"
-                )
-            
+            total_pages = max(1, -(-len(display_df) // page_size))
+            page = min(int(page), total_pages)
+
             start_idx = (page - 1) * page_size
             end_idx = start_idx + page_size
             
@@ -556,7 +1029,10 @@ def render_data_preview(consolidated: dict, raw_dataframes: dict, filters: dict)
                 height=400
             )
             
-            st.caption(f"Mostrando {min(end_idx, len(display_df)):,} de {len(display_df):,} registros")
+            st.caption(
+                f"Página {page} de {total_pages} — "
+                f"mostrando {min(end_idx, len(display_df)):,} de {len(display_df):,} registros"
+            )
 
 
 # =========================
@@ -575,7 +1051,13 @@ def render_sidebar() -> dict:
             index=0,
             help="Selecione o tipo de arquivo EFD ou deixe detectar automaticamente"
         )
-        
+
+        st.toggle(
+            "🐞 Modo debug",
+            key="debug_mode",
+            help="Exibe o traceback completo em caso de erro"
+        )
+
         st.divider()
         
         # Filtros Avançados
@@ -682,11 +1164,15 @@ def main():
         )
         
         if uploaded_files:
-            total_size = sum(len(f.getvalue()) for f in uploaded_files) / 1024
-            
+            # Lê os bytes de cada upload UMA vez: getvalue() copia o buffer
+            # inteiro a cada chamada, e eles são usados pelo sniff do tipo,
+            # pelo banner de tamanho e pelo processamento
+            file_blobs = [(f.name, f.getvalue()) for f in uploaded_files]
+            total_size = sum(len(data) for _, data in file_blobs) / 1024
+
             # Detecta tipo automaticamente se necessário
             if efd_type == "Detectar Automaticamente":
-                detected_type = detect_efd_type(uploaded_files[0].getvalue())
+                detected_type = detect_efd_type(file_blobs[0][1])
                 type_label = "EFD ICMS/IPI" if detected_type == "ICMS_IPI" else "EFD Contribuições"
                 actual_type = detected_type
             elif efd_type == "EFD ICMS/IPI (Fiscal)":
@@ -718,7 +1204,7 @@ def main():
                         progress_bar = st.progress(0, text="Iniciando...")
                         
                         consolidated, raw_dataframes, metrics_list = process_multiple_files(
-                            uploaded_files, actual_type, progress_bar
+                            file_blobs, actual_type, progress_bar
                         )
                         
                         # Aplica filtros
@@ -726,6 +1212,22 @@ def main():
                             k: apply_filters(v, filters) for k, v in consolidated.items()
                         }
                         
+                        # Os caches de agregados usam hash por identidade
+                        # (id(df), len(df)): um DataFrame novo pode reaproveitar
+                        # o endereço de um já liberado com o mesmo tamanho e
+                        # devolver os totais do upload anterior. Limpa tudo ao
+                        # armazenar novos resultados.
+                        _cfop_agg.clear()
+                        _part_agg.clear()
+                        _block_totals.clear()
+                        # Descarta os caches de busca da prévia pelo mesmo
+                        # motivo: guardam dados derivados dos frames antigos
+                        for stale_key in [
+                            k for k in st.session_state
+                            if k.startswith('_search_cols_') or k.startswith('_haystack_')
+                        ]:
+                            del st.session_state[stale_key]
+
                         # Armazena no session_state
                         st.session_state['consolidated'] = filtered_consolidated
                         st.session_state['raw_dataframes'] = raw_dataframes
@@ -753,7 +1255,13 @@ def main():
                         st.error(f"❌ Erro ao processar arquivo: {e}")
                     except Exception as e:
                         st.error(f"❌ Erro inesperado: {e}")
-                        st.exception(e)
+                        # Traceback completo só no modo debug: serializar e
+                        # formatar cada frame para o browser é caro e expõe
+                        # detalhes internos em produção
+                        if st.session_state.get('debug_mode'):
+                            st.exception(e)
+                        else:
+                            logger.exception("Erro inesperado no processamento")
     
     # Exibe dashboard e preview se há dados processados
     if 'consolidated' in st.session_state and st.session_state['consolidated']:
@@ -767,11 +1275,10 @@ def main():
         
         st.divider()
         
-        # Preview
+        # Preview (os blocos no session_state já estão filtrados)
         render_data_preview(
             st.session_state['consolidated'],
-            st.session_state.get('raw_dataframes', {}),
-            st.session_state.get('filters', {})
+            st.session_state.get('raw_dataframes', {})
         )
         
         st.divider()
@@ -793,27 +1300,49 @@ def main():
                     })
             
             if stats_data:
-                stats_df = pd.DataFrame(stats_data)
-                st.dataframe(stats_df, use_container_width=True, hide_index=True)
+                # st.table aceita a lista de dicts direto — sem construir
+                # DataFrame nem serializar via pandas para uma tabela pequena
+                st.table(stats_data)
             else:
                 st.warning("Nenhum bloco consolidado encontrado.")
         
         with col2:
             st.subheader("⬇️ Download")
-            
-            excel_bytes = create_excel_download(st.session_state['consolidated'])
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_name = f"sped_consolidado_{timestamp}.xlsx"
-            
-            st.download_button(
-                label="📥 Baixar Excel Consolidado",
-                data=excel_bytes,
-                file_name=output_name,
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                type="primary",
-                use_container_width=True
+
+            formato = st.radio(
+                "Formato",
+                options=["Excel (.xlsx)", "Parquet (rápido)"],
+                index=0,
+                horizontal=True,
+                help="Parquet é colunar e comprimido: ideal para reprocessar os dados em pandas/BI"
             )
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+            if formato == "Parquet (rápido)":
+                parquet_bytes = create_parquet_download(st.session_state['consolidated'])
+
+                st.download_button(
+                    label="📥 Baixar Parquet Consolidado (.zip)",
+                    data=parquet_bytes,
+                    file_name=f"sped_consolidado_{timestamp}.zip",
+                    mime="application/zip",
+                    type="primary",
+                    use_container_width=True
+                )
+            else:
+                excel_path = create_excel_download(st.session_state['consolidated'])
+
+                # Handle de arquivo: o Streamlit faz streaming do conteúdo
+                # sem pinar o workbook inteiro na memória da sessão
+                st.download_button(
+                    label="📥 Baixar Excel Consolidado",
+                    data=open(excel_path, 'rb'),
+                    file_name=f"sped_consolidado_{timestamp}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    type="primary",
+                    use_container_width=True
+                )
     
     # Rodapé
     st.divider()
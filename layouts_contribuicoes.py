@@ -232,3 +232,12 @@ GROUPS_CONTRIBUICOES = {
 
 EFD_TYPE = 'CONTRIBUICOES'
 EFD_DESCRIPTION = 'EFD Contribuições (PIS/COFINS)'
+
+# Colunas de baixa cardinalidade (códigos repetidos milhares de vezes) que
+# podem ser convertidas para dtype category antes da consolidação: chaves de
+# merge menores e bem menos memória na exportação
+CATEGORICAL_COLUMNS_CONTRIBUICOES = (
+    'CFOP', 'COD_PART', 'CST_ICMS', 'CST_IPI', 'CST_PIS', 'CST_COFINS',
+    'COD_MOD', 'COD_SIT', 'IND_OPER', 'IND_EMIT', 'IND_FRT',
+    'IND_PGTO', 'IND_MOV', 'NAT_BC_CRED', 'UNID',
+)
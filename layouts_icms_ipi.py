@@ -263,3 +263,12 @@ GROUPS_ICMS_IPI = {
 # Tipo de EFD
 EFD_TYPE = 'ICMS_IPI'
 EFD_DESCRIPTION = 'EFD ICMS/IPI (SPED Fiscal)'
+
+# Colunas de baixa cardinalidade (códigos repetidos milhares de vezes) que
+# podem ser convertidas para dtype category antes da consolidação: chaves de
+# merge menores e bem menos memória na exportação
+CATEGORICAL_COLUMNS_ICMS_IPI = (
+    'CFOP', 'COD_PART', 'CST_ICMS', 'CST_IPI', 'CST_PIS', 'CST_COFINS',
+    'COD_MOD', 'COD_SIT', 'IND_OPER', 'IND_EMIT', 'IND_FRT',
+    'IND_PGTO', 'IND_MOV', 'UNID', 'UF',
+)
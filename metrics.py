@@ -5,16 +5,18 @@ Rastreia estatísticas e métricas durante o processamento de arquivos SPED
 para monitoramento, debugging e otimização.
 """
 
+import heapq
+import operator
 import time
 from dataclasses import dataclass, field
-from typing import Dict, List
-from collections import defaultdict
+from typing import Deque, Dict, List
+from collections import Counter, deque
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class ProcessingMetrics:
     """
     Métricas de processamento de arquivos SPED.
@@ -26,8 +28,8 @@ class ProcessingMetrics:
         skipped_lines: Linhas ignoradas (vazias, comentários)
         registros_por_tipo: Contador de registros por tipo
         erros_por_tipo: Contador de erros por tipo
-        tempo_inicio: Timestamp de início do processamento
-        tempo_fim: Timestamp de fim do processamento
+        tempo_inicio: Timestamp monotônico de início (em nanossegundos)
+        tempo_fim: Timestamp monotônico de fim (em nanossegundos)
         arquivo_processado: Nome do arquivo sendo processado
     """
     
@@ -35,11 +37,13 @@ class ProcessingMetrics:
     processed_lines: int = 0
     error_lines: int = 0
     skipped_lines: int = 0
-    registros_por_tipo: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
-    erros_por_tipo: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
-    warnings: List[str] = field(default_factory=list)
-    tempo_inicio: float = field(default_factory=time.time)
-    tempo_fim: float = 0.0
+    registros_por_tipo: Counter = field(default_factory=Counter)
+    erros_por_tipo: Counter = field(default_factory=Counter)
+    # Limitado aos 100 avisos mais recentes; o deque descarta o mais antigo
+    # em O(1) quando cheio (list.pop(0) deslocava a lista inteira)
+    warnings: Deque[str] = field(default_factory=lambda: deque(maxlen=100))
+    tempo_inicio: int = field(default_factory=time.monotonic_ns)
+    tempo_fim: int = 0
     arquivo_processado: str = ""
     
     def increment_registro(self, tipo_registro: str) -> None:
@@ -51,7 +55,23 @@ class ProcessingMetrics:
         """
         self.registros_por_tipo[tipo_registro] += 1
         self.processed_lines += 1
-    
+
+    def bulk_increment(self, codes: List[str]) -> None:
+        """
+        Incrementa contadores de registros em lote.
+
+        O Counter.update percorre o lote inteiro em C, em vez de um acesso
+        de dicionário por linha no loop quente do parser.
+
+        Args:
+            codes: Códigos de registro acumulados (ex: ['C100', 'C170', ...])
+        """
+        if not codes:
+            return
+        self.registros_por_tipo.update(codes)
+        self.processed_lines += len(codes)
+
+
     def increment_erro(self, tipo_erro: str = "Genérico") -> None:
         """
         Incrementa contador de erros.
@@ -70,23 +90,24 @@ class ProcessingMetrics:
             warning: Mensagem de aviso
         """
         self.warnings.append(warning)
-        if len(self.warnings) > 100:  # Limita a 100 warnings
-            self.warnings.pop(0)
     
     def finalizar(self) -> None:
         """Marca o fim do processamento e registra timestamp."""
-        self.tempo_fim = time.time()
-    
+        self.tempo_fim = time.monotonic_ns()
+
     @property
     def tempo_processamento(self) -> float:
         """
         Retorna tempo de processamento em segundos.
-        
+
+        O relógio monotônico só é amostrado se o processamento ainda não
+        foi finalizado; depois de finalizar() a leitura é aritmética pura.
+
         Returns:
             Tempo decorrido em segundos
         """
-        fim = self.tempo_fim if self.tempo_fim > 0 else time.time()
-        return fim - self.tempo_inicio
+        fim = self.tempo_fim if self.tempo_fim > 0 else time.monotonic_ns()
+        return (fim - self.tempo_inicio) / 1e9
     
     @property
     def taxa_sucesso(self) -> float:
@@ -123,14 +144,21 @@ class ProcessingMetrics:
         Returns:
             Lista de tuplas (tipo_registro, quantidade) ordenada por quantidade
         """
-        return sorted(
-            self.registros_por_tipo.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:n]
+        # Seleção parcial O(K log n): não ordena todos os tipos para pegar n
+        return heapq.nlargest(n, self.registros_por_tipo.items(),
+                              key=operator.itemgetter(1))
     
     def log_summary(self) -> None:
         """Registra resumo das métricas no log."""
+        # Sem INFO habilitado, nenhuma das ~15 f-strings precisa ser formatada
+        if not logger.isEnabledFor(logging.INFO):
+            return
+
+        # Congela o timestamp final para que as propriedades lidas em
+        # sequência (tempo, linhas/segundo) não reamostrem o relógio
+        if self.tempo_fim == 0:
+            self.finalizar()
+
         logger.info("=" * 60)
         logger.info("RESUMO DO PROCESSAMENTO")
         logger.info("=" * 60)
@@ -153,7 +181,8 @@ class ProcessingMetrics:
         
         if self.erros_por_tipo:
             logger.info("\nErros por Tipo:")
-            for tipo, qtd in sorted(self.erros_por_tipo.items(), key=lambda x: x[1], reverse=True):
+            for tipo, qtd in sorted(self.erros_por_tipo.items(),
+                                    key=operator.itemgetter(1), reverse=True):
                 logger.info(f"  {tipo}: {qtd:,}")
         
         if self.warnings:
@@ -163,7 +192,7 @@ class ProcessingMetrics:
                     logger.info(f"  - {warning}")
             else:
                 logger.info("  (Mostrando últimos 5 avisos)")
-                for warning in self.warnings[-5:]:
+                for warning in list(self.warnings)[-5:]:
                     logger.info(f"  - {warning}")
         
         logger.info("=" * 60)
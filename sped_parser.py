@@ -1,13 +1,19 @@
 
+import functools
 import logging
+import mmap
+import os
+import re
+import stat
+import sys
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import time
 
+import numpy as np
 import pandas as pd
-import yaml
 
 # Importa módulos customizados
 from exceptions import (
@@ -21,18 +27,18 @@ from validators import (
 )
 from metrics import ProcessingMetrics
 
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Biblioteca não configura logging global: quem importa decide handler,
+# nível e formato (NullHandler evita o aviso "no handlers could be found")
 logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
 
 # Carrega configurações do arquivo YAML
 CONFIG_FILE = Path(__file__).parent / 'config.yaml'
 CONFIG = {}
 try:
     if CONFIG_FILE.exists():
+        # Import tardio: o yaml só é pago quando existe config.yaml
+        import yaml
         with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
             CONFIG = yaml.safe_load(f)
         logger.info(f"Configurações carregadas de {CONFIG_FILE}")
@@ -41,16 +47,25 @@ try:
 except Exception as e:
     logger.warning(f"Erro ao carregar configurações: {e}. Usando valores padrão.")
 
+def _flatten_config(d: dict, prefix: str = ''):
+    """Gera pares ('a.b.c', valor) a partir do dicionário aninhado do YAML."""
+    for key, value in d.items():
+        dotted = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten_config(value, f"{dotted}.")
+        else:
+            yield dotted, value
+
+
+# Achatado uma vez no carregamento: get_config vira um único lookup de hash,
+# sem split nem caminhada isinstance por chamada
+_FLAT_CONFIG = dict(_flatten_config(CONFIG)) if CONFIG else {}
+
+
 # Função auxiliar para obter configurações com valor padrão
 def get_config(path: str, default=None):
     """Obtém valor de configuração usando notação de ponto (ex: 'processing.max_file_size_mb')"""
-    keys = path.split('.')
-    value = CONFIG
-    for key in keys:
-        if isinstance(value, dict):
-            value = value.get(key)
-        else:
-            return default
+    value = _FLAT_CONFIG.get(path)
     return value if value is not None else default
 
 
@@ -96,22 +111,53 @@ IND_FRT_MAP = {
     '9': 'Sem cobrança de frete'
 }
 
-# Formato de moeda brasileira para Excel
-BRL_ACCOUNTING = get_config('export.currency_format', 
-    '_-* "R$" * #,##0.00_-;_-* "R$" * -#,##0.00_-;_-* "R$" * "-"??_-;_-@_-')
+@dataclass(frozen=True, slots=True)
+class SpedConfig:
+    """
+    Configurações efetivas do parser, materializadas uma vez do YAML.
 
-# Tamanho máximo de arquivo (em MB, convertido para bytes)
-MAX_FILE_SIZE = get_config('processing.max_file_size_mb', 100) * 1024 * 1024
+    Acesso por atributo (slot em C) em vez de get_config('a.b.c'), que
+    aloca um split e percorre dicionários a cada chamada — relevante nos
+    pontos consultados por arquivo/por parser.
+    """
+    max_file_size: int
+    validation_tolerance: float
+    currency_format: str
+    encoding_sample_bytes: int
+    fallback_encodings: tuple
+    default_encoding: str
+    validate_required_fields: bool
+    strict_mode: bool
+
+
+SETTINGS = SpedConfig(
+    max_file_size=get_config('processing.max_file_size_mb', 100) * 1024 * 1024,
+    validation_tolerance=get_config('processing.validation_tolerance', 0.01),
+    currency_format=get_config(
+        'export.currency_format',
+        '_-* "R$" * #,##0.00_-;_-* "R$" * -#,##0.00_-;_-* "R$" * "-"??_-;_-@_-'
+    ),
+    encoding_sample_bytes=get_config('processing.encoding_sample_bytes', 256_000),
+    fallback_encodings=tuple(get_config(
+        'processing.fallback_encodings',
+        ['latin-1', 'utf-8', 'cp1252', 'iso-8859-1']
+    )),
+    default_encoding=get_config('processing.default_encoding', 'latin-1'),
+    validate_required_fields=get_config('validation.validate_required_fields', True),
+    strict_mode=get_config('validation.strict_mode', False),
+)
 
-# Tolerância para validação de totais
-VALIDATION_TOLERANCE = get_config('processing.validation_tolerance', 0.01)
+# Aliases mantidos para compatibilidade com os consumidores existentes
+BRL_ACCOUNTING = SETTINGS.currency_format
+MAX_FILE_SIZE = SETTINGS.max_file_size
+VALIDATION_TOLERANCE = SETTINGS.validation_tolerance
 
 
 # =========================
 # LAYOUTS DOS REGISTROS
 # =========================
 
-@dataclass
+@dataclass(slots=True)
 class RegistroLayout:
     """Define o layout de um registro SPED."""
     codigo: str
@@ -378,63 +424,95 @@ GROUPS: Dict[str, Tuple[str, List[str], str, str, str]] = {
     'D700': ('D700', [], 'D700_INDEX', 'D010_INDEX', 'D010'),
 }
 
+# Interna códigos de registro e nomes de coluna: chaves idênticas por
+# identidade curto-circuitam a comparação nos dict lookups do loop quente
+LAYOUTS = {sys.intern(code): [sys.intern(c) for c in cols]
+           for code, cols in LAYOUTS.items()}
+NUMERIC_COLUMNS = {sys.intern(code): [sys.intern(c) for c in cols]
+                   for code, cols in NUMERIC_COLUMNS.items()}
+
 
 # =========================
 # FUNÇÕES UTILITÁRIAS
 # =========================
 
-def detect_encoding(file_path: Path, sample_bytes: int = None) -> str:
+def detect_encoding(file_path: Path, sample_bytes: int = None,
+                    stat_result: os.stat_result = None) -> str:
     """
     Detecta o encoding de um arquivo automaticamente.
 
     Args:
         file_path: Caminho do arquivo
         sample_bytes: Número de bytes a ler para detecção (None = usar config)
+        stat_result: Resultado de stat já obtido (ex: por validate_file_path),
+            para não repetir a syscall
 
     Returns:
         Nome do encoding detectado
-        
+
     Raises:
         SpedEncodingError: Se não conseguir detectar encoding válido
     """
     if sample_bytes is None:
-        sample_bytes = get_config('processing.encoding_sample_bytes', 256_000)
-    
-    try:
-        raw_data = file_path.read_bytes()[:sample_bytes]
-        
-        # Tenta usar charset_normalizer se disponível
+        sample_bytes = SETTINGS.encoding_sample_bytes
+
+    # Memoiza por (caminho, mtime): reprocessar o mesmo arquivo na mesma
+    # execução não relê nem redetecta
+    if stat_result is not None:
+        mtime_ns = stat_result.st_mtime_ns
+    else:
         try:
-            from charset_normalizer import from_bytes
-            result = from_bytes(raw_data).best()
-            if result and result.encoding:
-                logger.info(f"Encoding detectado via charset_normalizer: {result.encoding}")
-                return result.encoding
-        except ImportError:
-            logger.debug("charset_normalizer não disponível, usando fallback")
-        
-        # Tenta encodings de fallback
-        fallback_encodings = get_config('processing.fallback_encodings', 
-                                       ['latin-1', 'utf-8', 'cp1252', 'iso-8859-1'])
-        
-        for encoding in fallback_encodings:
-            try:
-                raw_data.decode(encoding)
-                logger.info(f"Encoding detectado via fallback: {encoding}")
-                return encoding
-            except (UnicodeDecodeError, LookupError):
-                continue
-        
-        # Se nenhum encoding funcionou, usa padrão
-        default_encoding = get_config('processing.default_encoding', 'latin-1')
-        logger.warning(f"Nenhum encoding detectado, usando padrão: {default_encoding}")
-        return default_encoding
-    
+            mtime_ns = file_path.stat().st_mtime_ns
+        except OSError:
+            mtime_ns = -1
+
+    return _detect_encoding_sample(str(file_path), mtime_ns, sample_bytes)
+
+
+@functools.lru_cache(maxsize=32)
+def _detect_encoding_sample(path_str: str, mtime_ns: int, sample_bytes: int) -> str:
+    """Detecta o encoding lendo apenas os primeiros `sample_bytes` do arquivo."""
+    file_path = Path(path_str)
+    try:
+        # Lê só a amostra: read_bytes() carregava o arquivo INTEIRO (até
+        # 100 MB) na memória para depois fatiar os primeiros KBs
+        with file_path.open('rb') as f:
+            raw_data = f.read(sample_bytes)
+
+        return _detect_encoding_bytes(raw_data)
+
     except Exception as e:
         logger.error(f"Erro ao detectar encoding: {e}")
         raise SpedEncodingError(f"Falha ao detectar encoding", str(file_path)) from e
 
 
+def _detect_encoding_bytes(raw_data: bytes) -> str:
+    """Detecta o encoding de uma amostra de bytes já em memória."""
+    # Tenta usar charset_normalizer se disponível
+    try:
+        from charset_normalizer import from_bytes
+        result = from_bytes(raw_data).best()
+        if result and result.encoding:
+            logger.info(f"Encoding detectado via charset_normalizer: {result.encoding}")
+            return result.encoding
+    except ImportError:
+        logger.debug("charset_normalizer não disponível, usando fallback")
+
+    # Tenta encodings de fallback
+    for encoding in SETTINGS.fallback_encodings:
+        try:
+            raw_data.decode(encoding)
+            logger.info(f"Encoding detectado via fallback: {encoding}")
+            return encoding
+        except (UnicodeDecodeError, LookupError):
+            continue
+
+    # Se nenhum encoding funcionou, usa padrão
+    default_encoding = SETTINGS.default_encoding
+    logger.warning(f"Nenhum encoding detectado, usando padrão: {default_encoding}")
+    return default_encoding
+
+
 def parse_sped_line(line: str) -> List[str]:
     """
     Faz o parse de uma linha SPED, removendo pipes inicial e final.
@@ -445,26 +523,34 @@ def parse_sped_line(line: str) -> List[str]:
     Returns:
         Lista de campos da linha
     """
-    parts = line.rstrip('\r\n').split('|')
-    
-    # Remove pipe inicial se existir
+    # Split direto: o rstrip prévio copiava a linha inteira só para tirar a
+    # quebra, que de toda forma cai no último pedaço depois do pipe final
+    parts = line.split('|')
+
+    # Remove pedaço antes do pipe inicial
     if parts and parts[0] == '':
         parts = parts[1:]
-    
-    # Remove pipe final se existir
-    if parts and parts[-1] == '':
+
+    # Remove pedaço após o pipe final ('' ou a própria quebra de linha)
+    if parts and parts[-1] in ('', '\n', '\r\n', '\r'):
         parts = parts[:-1]
-    
+
     return parts
 
 
+# Tabela de conversão do formato numérico brasileiro: apaga o separador de
+# milhar e troca a vírgula decimal por ponto — um único passe em C, em vez
+# de um replace (e uma alocação de coluna) por caractere tratado
+_BRL_TRANS = str.maketrans({'.': None, ',': '.'})
+
+
 def convert_numeric_columns(df: pd.DataFrame, columns: List[str]) -> None:
     """
     Converte colunas numéricas do formato brasileiro para formato Python.
-    
+
     Formato brasileiro: 1.234,56
     Formato Python: 1234.56
-    
+
     Otimizado com operações vetorizadas do pandas.
 
     Args:
@@ -474,24 +560,18 @@ def convert_numeric_columns(df: pd.DataFrame, columns: List[str]) -> None:
     for col in columns:
         if col not in df.columns:
             continue
-        
+
         try:
-            # Converte para string apenas se necessário
-            if not pd.api.types.is_string_dtype(df[col]):
-                df[col] = df[col].astype(str)
-            
-            # Operações vetorizadas: remove pontos e substitui vírgula por ponto
-            # Usa regex=False para melhor performance
-            df[col] = (
-                df[col]
-                .str.replace('.', '', regex=False)
-                .str.replace(',', '.', regex=False)
-                .str.strip()
-            )
-            
-            # Converte para numérico
-            # errors='coerce' transforma valores inválidos em NaN
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+            # Coluna já numérica (reconversão/consolidação): nada a fazer —
+            # e o antigo astype(str) seguido de replace quebraria aqui
+            if pd.api.types.is_numeric_dtype(df[col]):
+                continue
+
+            # Um passe de translate + conversão direto sobre a coluna de
+            # strings do parser (sem cópia astype(str) intermediária);
+            # to_numeric ignora espaços nas pontas e errors='coerce'
+            # transforma inválidos em NaN
+            df[col] = pd.to_numeric(df[col].str.translate(_BRL_TRANS), errors='coerce')
             
             # Log de valores inválidos se houver muitos
             null_count = df[col].isna().sum()
@@ -502,6 +582,51 @@ def convert_numeric_columns(df: pd.DataFrame, columns: List[str]) -> None:
             logger.warning(f"Erro ao converter coluna {col}: {e}")
 
 
+def parse_dates_unique(series: pd.Series, fmt: str) -> pd.Series:
+    """
+    Converte uma coluna de datas SPED parseando só os valores únicos.
+
+    Arquivos SPED repetem a mesma data em milhares de linhas (itens do
+    mesmo documento, mesmo período de apuração). Parsear apenas os valores
+    únicos e espalhar o resultado com um map reduz o trabalho do
+    to_datetime em 2 a 3 ordens de grandeza nas colunas típicas.
+
+    Args:
+        series: Série com datas em texto de largura fixa
+        fmt: Formato strftime (ex: '%Y%m%d' ou '%d%m%Y')
+
+    Returns:
+        Série datetime64 com o mesmo índice (inválidos viram NaT)
+    """
+    uniques = series.unique()
+    parsed = pd.to_datetime(uniques, format=fmt, errors='coerce')
+    return series.map(pd.Series(parsed, index=uniques))
+
+
+def map_codes(series: pd.Series, mapping: Dict[str, str]) -> pd.Series:
+    """
+    Traduz códigos via gather vetorizado, preservando valores fora do mapa.
+
+    Equivale a series.map(mapping).fillna(series), mas em um único passe:
+    o Categorical resolve os códigos em C e o gather no array de rótulos
+    dispensa as duas Series intermediárias do map + fillna.
+
+    Args:
+        series: Série com os códigos originais (ex: '0'/'1')
+        mapping: Dicionário código -> descrição
+
+    Returns:
+        Série com códigos traduzidos, mesmo índice da original
+    """
+    cat = pd.Categorical(series, categories=list(mapping))
+    codes = cat.codes
+    labels = np.array(list(mapping.values()), dtype=object)
+    out = series.to_numpy(dtype=object, copy=True)
+    mask = codes >= 0
+    out[mask] = labels[codes[mask]]
+    return pd.Series(out, index=series.index)
+
+
 def concat_unique_values(series: pd.Series) -> str:
     """
     Concatena valores únicos de uma série, separados por ponto e vírgula.
@@ -512,35 +637,49 @@ def concat_unique_values(series: pd.Series) -> str:
     Returns:
         String com valores únicos concatenados
     """
-    values = [str(v) for v in series if pd.notna(v) and str(v).strip()]
-    unique_values = sorted(set(values))
-    return '; '.join(unique_values) if unique_values else ''
+    # Passe vetorizado: dropna/strip em C e np.unique já devolve ordenado,
+    # em vez de str()+strip() por elemento e sort de um set em Python
+    s = series.dropna().astype(str).str.strip()
+    values = np.unique(s[s != ''].to_numpy())
+    return '; '.join(values) if values.size else ''
+
+
+@functools.lru_cache(maxsize=64)
+def _resolve_path(path_str: str) -> Path:
+    """Resolve o caminho (realpath) uma única vez por arquivo na execução."""
+    return Path(path_str).resolve()
 
 
-def validate_file_path(file_path: Path) -> None:
+def validate_file_path(file_path: Path) -> os.stat_result:
     """
     Valida se o caminho do arquivo é válido e seguro.
 
     Args:
         file_path: Caminho do arquivo
 
+    Returns:
+        Resultado do stat do arquivo, para reuso pelos chamadores (evita
+        repetir a syscall em detect_encoding e afins)
+
     Raises:
         SpedFileError: Se o arquivo for inválido, não existir, ou for muito grande
     """
     try:
-        # Sanitiza o caminho para prevenir path traversal
-        file_path = file_path.resolve().absolute()
-        
-        # Verifica se o arquivo existe
-        if not file_path.exists():
+        # Sanitiza o caminho para prevenir path traversal (realpath memoizado)
+        file_path = _resolve_path(str(file_path))
+
+        # Um único stat responde existência, tipo e tamanho
+        try:
+            stat_result = file_path.stat()
+        except FileNotFoundError:
             raise SpedFileError("Arquivo não encontrado", str(file_path))
-        
+
         # Verifica se é um arquivo (não diretório)
-        if not file_path.is_file():
+        if not stat.S_ISREG(stat_result.st_mode):
             raise SpedFileError("Caminho não é um arquivo", str(file_path))
-        
+
         # Verifica tamanho do arquivo
-        file_size = file_path.stat().st_size
+        file_size = stat_result.st_size
         if file_size == 0:
             raise SpedFileError("Arquivo vazio", str(file_path))
         
@@ -557,7 +696,8 @@ def validate_file_path(file_path: Path) -> None:
             logger.warning(f"Extensão incomum: {file_path.suffix}")
         
         logger.info(f"Arquivo validado: {file_path.name} ({file_size / 1024:.1f} KB)")
-    
+        return stat_result
+
     except SpedFileError:
         raise
     except Exception as e:
@@ -572,9 +712,10 @@ def validate_file_path(file_path: Path) -> None:
 class SpedParser:
     """Parser para arquivos SPED."""
     
-    def __init__(self, file_path: Path, layouts: Dict[str, List[str]] = None, 
+    def __init__(self, file_path: Path, layouts: Dict[str, List[str]] = None,
                  numeric_columns: Dict[str, List[str]] = None,
-                 groups: Dict[str, Tuple[str, List[str], str, str, str]] = None):
+                 groups: Dict[str, Tuple[str, List[str], str, str, str]] = None,
+                 stat_result: os.stat_result = None):
         """
         Inicializa o parser.
 
@@ -583,25 +724,45 @@ class SpedParser:
             layouts: Dicionário opcional de layouts por registro.
             numeric_columns: Dicionário opcional de colunas numéricas por registro.
             groups: Dicionário opcional de grupos de consolidação.
-            
+            stat_result: Resultado de stat já obtido na validação, para não
+                repetir a syscall na detecção de encoding.
+
         Raises:
             SpedFileError: Se o arquivo for inválido
             SpedEncodingError: Se não conseguir detectar encoding
         """
         self.file_path = file_path
-        self.encoding = detect_encoding(file_path)
-        
+        self.stream = None
+        self.encoding = detect_encoding(file_path, stat_result=stat_result)
+        self._init_config(layouts, numeric_columns, groups)
+        self.metrics.arquivo_processado = str(file_path.name)
+
+    def _init_config(self, layouts: Dict[str, List[str]] = None,
+                     numeric_columns: Dict[str, List[str]] = None,
+                     groups: Dict[str, Tuple[str, List[str], str, str, str]] = None) -> None:
+        """Inicializa layouts, índices, ações de indexação e métricas."""
         # Usa configurações externas ou internas
-        self.layouts = layouts if layouts is not None else LAYOUTS
+        layouts = layouts if layouts is not None else LAYOUTS
+        # Interna os códigos também para layouts externos (EFD ICMS/IPI,
+        # Contribuições): o registro interning no loop casa por identidade
+        self.layouts = {sys.intern(code): cols for code, cols in layouts.items()}
         self.numeric_columns = numeric_columns if numeric_columns is not None else NUMERIC_COLUMNS
         self.groups = groups if groups is not None else GROUPS
-        
+
         self.rows: Dict[str, List[List[str]]] = {code: [] for code in self.layouts}
-        
+
+        # Tabela de despacho achatada: comprimento esperado por registro,
+        # calculada uma vez — o loop quente deixa de rehashear self.layouts
+        # e de refazer len() da lista de campos a cada linha
+        self._layout_len = {code: len(cols) for code, cols in self.layouts.items()}
+
+        # Modelos pré-alocados para padding: copiar uma lista fixa é um
+        # memcpy em C, sem o [''] * n temporário por linha curta
+        self._pad_templates = {code: [''] * n for code, n in self._layout_len.items()}
+
         # Métricas de processamento
         self.metrics = ProcessingMetrics()
-        self.metrics.arquivo_processado = str(file_path.name)
-        
+
         # Índices de controle por bloco
         self.indices = {
             'c010': -1, 'c100': -1, 'c500': -1,
@@ -675,301 +836,301 @@ class SpedParser:
                         'col': parent_idx_name
                     })
         
+        # Compila as listas de ações em um callable por registro: o loop
+        # quente faz uma chamada, sem lookups de dict nem comparação de
+        # strings 'increment'/'read' por linha
+        self._compiled_actions = {
+            code: self._compile_actions(actions)
+            for code, actions in self.record_actions.items()
+        }
+
+        # Colunas finais por registro (layout + índices), fixas após o
+        # __init__ — calculadas uma vez em vez de por DataFrame criado
+        self._columns_cache = {
+            code: self._get_columns_for_code(code) for code in self.layouts
+        }
+
+        # Despacho por registro: um handler especializado por código, com
+        # bucket, padding, ações e índices capturados como células locais
+        self._dispatch = {code: self._make_handler(code) for code in self.layouts}
+
         # Configurações de validação
-        self.validate_data = get_config('validation.validate_required_fields', True)
-        self.strict_mode = get_config('validation.strict_mode', False)
-    
-    def parse(self) -> Dict[str, pd.DataFrame]:
+        self.validate_data = SETTINGS.validate_required_fields
+        self.strict_mode = SETTINGS.strict_mode
+
+    def _make_handler(self, code: str):
         """
-        Faz o parse do arquivo SPED completo.
+        Cria o handler especializado de um registro.
+
+        A closure captura o bucket de linhas, o comprimento esperado, o
+        modelo de padding, a ação de índices compilada e o dicionário de
+        índices como variáveis locais — o corpo roda sem nenhum acesso a
+        atributo de self por linha.
+
+        Args:
+            code: Código do registro (ex: 'C100')
 
         Returns:
-            Dicionário com DataFrames para cada registro
-            
-        Raises:
-            SpedParseError: Se houver erro crítico no parsing
+            Callable(raw_line) que faz split, padding, indexação e append
         """
-        logger.info(f"Iniciando parse do arquivo: {self.file_path}")
-        start_time = time.time()
-        
-        try:
-            with self.file_path.open('r', encoding=self.encoding, errors='replace') as file:
-                # Conta total de linhas primeiro (para métricas)
-                file.seek(0)
-                self.metrics.total_lines = sum(1 for _ in file)
-                file.seek(0)
-                
-                for line_number, raw_line in enumerate(file, 1):
-                    # Ignora linhas vazias ou que não começam com pipe
-                    if not raw_line.strip() or not raw_line.startswith('|'):
-                        self.metrics.skipped_lines += 1
-                        continue
-                    
-                    try:
-                        self._process_line(raw_line, line_number)
-                    except SpedParseError as e:
-                        self.metrics.increment_erro("Parse Error")
-                        if self.strict_mode:
-                            raise
-                        logger.warning(str(e))
-                    except Exception as e:
-                        self.metrics.increment_erro("Erro Desconhecido")
-                        logger.warning(f"Erro na linha {line_number}: {e}")
-                        if self.strict_mode:
-                            raise SpedParseError(
-                                f"Erro inesperado ao processar linha",
-                                line_number=line_number,
-                                line_content=raw_line
-                            ) from e
-            
-            # Converte listas em DataFrames
-            dataframes = self._create_dataframes()
-            
-            # Finaliza métricas
-            self.metrics.finalizar()
-            self.metrics.log_summary()
-            
-            logger.info(f"Parse concluído em {time.time() - start_time:.2f}s. "
-                       f"{len(dataframes)} tipos de registro processados.")
-            
-            return dataframes
-        
-        except Exception as e:
-            logger.error(f"Erro ao fazer parse do arquivo: {e}")
-            raise
-    
-    def _process_line(self, raw_line: str, line_number: int = None) -> None:
+        bucket_append = self.rows[code].append
+        expected_len = self._layout_len[code]
+        template = self._pad_templates[code]
+        action = self._compiled_actions.get(code)
+        indices = self.indices
+        split = parse_sped_line
+
+        if action is None:
+            def handler(raw_line):
+                parts = split(raw_line)
+                n = len(parts)
+                if n != expected_len:
+                    if n > expected_len:
+                        parts = parts[:expected_len]
+                    else:
+                        out = template.copy()
+                        out[:n] = parts
+                        parts = out
+                bucket_append(parts)
+        else:
+            def handler(raw_line):
+                parts = split(raw_line)
+                n = len(parts)
+                if n != expected_len:
+                    if n > expected_len:
+                        parts = parts[:expected_len]
+                    else:
+                        out = template.copy()
+                        out[:n] = parts
+                        parts = out
+                action(parts, indices)
+                bucket_append(parts)
+        return handler
+
+    @staticmethod
+    def _compile_actions(actions: List[dict]):
         """
-        Processa uma linha do arquivo SPED.
+        Especializa uma lista de ações de indexação em uma única closure.
+
+        As formas mais comuns (só incrementar o próprio índice, ou
+        incrementar + ler o header, ou só ler o pai) viram funções dedicadas
+        com as chaves pré-ligadas; o caso geral itera uma tupla achatada de
+        pares (é_incremento, chave).
 
         Args:
-            raw_line: Linha bruta do arquivo
-            line_number: Número da linha (para mensagens de erro)
-            
-        Raises:
-            SpedParseError: Se a linha estiver malformada
-        """
-        # Extrai código do registro
-        if len(raw_line) < 5:
-            raise SpedParseError(
-                "Linha muito curta para conter registro válido",
-                line_number=line_number,
-                line_content=raw_line
-            )
-        
-        registro = raw_line[1:5]
-        
-        # Incrementa métrica
-        self.metrics.increment_registro(registro)
-        
-        # Processa registro usando layouts dinâmicos
-        if registro in self.layouts:
-            self._process_generic(registro, raw_line)
-        # Registros desconhecidos são ignorados (mas já contados na métrica)
-    
-    def _process_c010(self, raw_line: str) -> None:
-        """Processa registro C010."""
-        self.indices['c010'] += 1
-        parts = self._pad_line(raw_line, 'C010')
-        parts.append(self.indices['c010'])
-        self.rows['C010'].append(parts)
-    
-    def _process_c100(self, raw_line: str) -> None:
-        """Processa registro C100."""
-        self.indices['c100'] += 1
-        parts = self._pad_line(raw_line, 'C100')
-        parts.extend([self.indices['c100'], self.indices['c010']])
-        self.rows['C100'].append(parts)
-    
-    def _process_c_child(self, registro: str, raw_line: str) -> None:
-        """Processa registros filhos do C100 (C170, C190, C195, C197)."""
-        parts = self._pad_line(raw_line, registro)
-        parts.append(self.indices['c100'])
-        self.rows[registro].append(parts)
-    
-    def _process_d010(self, raw_line: str) -> None:
-        """Processa registro D010."""
-        self.indices['d010'] += 1
-        parts = self._pad_line(raw_line, 'D010')
-        parts.append(self.indices['d010'])
-        self.rows['D010'].append(parts)
-    
-    def _process_d100(self, raw_line: str) -> None:
-        """Processa registro D100."""
-        self.indices['d100'] += 1
-        parts = self._pad_line(raw_line, 'D100')
-        parts.extend([self.indices['d100'], self.indices['d010']])
-        self.rows['D100'].append(parts)
-    
-    def _process_d_child(self, registro: str, raw_line: str) -> None:
-        """Processa registros filhos do D100 (D170, D190, D101, D105)."""
-        parts = self._pad_line(raw_line, registro)
-        parts.append(self.indices['d100'])
-        self.rows[registro].append(parts)
-    
-    def _process_a010(self, raw_line: str) -> None:
-        """Processa registro A010."""
-        self.indices['a010'] += 1
-        parts = self._pad_line(raw_line, 'A010')
-        parts.append(self.indices['a010'])
-        self.rows['A010'].append(parts)
-    
-    def _process_a100(self, raw_line: str) -> None:
-        """Processa registro A100."""
-        self.indices['a100'] += 1
-        parts = self._pad_line(raw_line, 'A100')
-        parts.extend([self.indices['a100'], self.indices['a010']])
-        self.rows['A100'].append(parts)
-    
-    def _process_f010(self, raw_line: str) -> None:
-        """Processa registro F010."""
-        self.indices['f010'] += 1
-        parts = self._pad_line(raw_line, 'F010')
-        parts.append(self.indices['f010'])
-        self.rows['F010'].append(parts)
-    
-    def _process_f100(self, raw_line: str) -> None:
-        """Processa registro F100."""
-        self.indices['f100'] += 1
-        parts = self._pad_line(raw_line, 'F100')
-        parts.extend([self.indices['f100'], self.indices['f010']])
-        self.rows['F100'].append(parts)
-    
-    def _process_f_child(self, registro: str, raw_line: str) -> None:
-        """Processa registros filhos do F100."""
-        parts = self._pad_line(raw_line, registro)
-        parts.append(self.indices['f100'])
-        self.rows[registro].append(parts)
-    
-    def _process_m(self, registro: str, raw_line: str) -> None:
-        """Processa registros do Bloco M."""
-        parts = self._pad_line(raw_line, registro)
-        self.rows[registro].append(parts)
+            actions: Lista de dicionários {type, key, col} de um registro
 
-    # ======== Bloco E ========
-    def _process_e100(self, raw_line: str) -> None:
+        Returns:
+            Callable(parts, indices) que aplica as ações na ordem original
         """
-        Processa registro E100 (período de apuração).
-
-        Atribui um índice sequencial e armazena o registro.
+        ops = tuple((a['type'] == 'increment', a['key']) for a in actions)
+
+        if len(ops) == 1:
+            is_inc, key = ops[0]
+            if is_inc:
+                def run(parts, indices, _k=key):
+                    valor = indices.get(_k, -1) + 1
+                    indices[_k] = valor
+                    parts.append(valor)
+            else:
+                def run(parts, indices, _k=key):
+                    parts.append(indices.get(_k, -1))
+            return run
+
+        if len(ops) == 2 and ops[0][0] and not ops[1][0]:
+            inc_key, read_key = ops[0][1], ops[1][1]
+
+            def run(parts, indices, _ik=inc_key, _rk=read_key):
+                valor = indices.get(_ik, -1) + 1
+                indices[_ik] = valor
+                parts.append(valor)
+                parts.append(indices.get(_rk, -1))
+            return run
+
+        def run(parts, indices, _ops=ops):
+            for is_inc, key in _ops:
+                if is_inc:
+                    valor = indices.get(key, -1) + 1
+                    indices[key] = valor
+                    parts.append(valor)
+                else:
+                    parts.append(indices.get(key, -1))
+        return run
+
+    @classmethod
+    def from_stream(cls, fileobj, encoding: str = None, name: str = '<stream>',
+                    layouts: Dict[str, List[str]] = None,
+                    numeric_columns: Dict[str, List[str]] = None,
+                    groups: Dict[str, Tuple[str, List[str], str, str, str]] = None) -> 'SpedParser':
         """
-        self.indices['e100'] += 1
-        parts = self._pad_line(raw_line, 'E100')
-        # Adiciona índice para relacionamento com E110
-        parts.append(self.indices['e100'])
-        self.rows['E100'].append(parts)
+        Cria um parser que lê diretamente de um stream binário seekável.
 
-    def _process_e110(self, raw_line: str) -> None:
-        """
-        Processa registro E110 (apuração ICMS operações próprias).
+        Evita a ida e volta por arquivo temporário: o stream (ex: upload do
+        Streamlit) é decodificado direto da memória, sem cópia em disco.
 
-        Atribui um índice sequencial e associa ao E100 mais recente.
-        """
-        self.indices['e110'] += 1
-        parts = self._pad_line(raw_line, 'E110')
-        # Adiciona índices: próprio e referência ao E100
-        parts.extend([self.indices['e110'], self.indices['e100']])
-        self.rows['E110'].append(parts)
+        Args:
+            fileobj: Stream binário seekável (BytesIO, SpooledTemporaryFile, etc)
+            encoding: Encoding do conteúdo (None = detecta numa amostra
+                inicial do stream, como o fluxo por caminho de arquivo)
+            name: Nome descritivo para logs e métricas
+            layouts: Dicionário opcional de layouts por registro.
+            numeric_columns: Dicionário opcional de colunas numéricas por registro.
+            groups: Dicionário opcional de grupos de consolidação.
 
-    def _process_e_child(self, registro: str, raw_line: str) -> None:
+        Returns:
+            Instância de SpedParser configurada para ler do stream
         """
-        Processa registros filhos de E110 (E111, E112, E113, E115, E116).
-
-        Adiciona índice do pai (E110).
+        if encoding is None:
+            # Mesma detecção do fluxo por arquivo, sobre a amostra inicial:
+            # assumir latin-1 transformaria acentos de uploads UTF-8 em
+            # mojibake silencioso
+            pos = fileobj.tell()
+            sample = fileobj.read(SETTINGS.encoding_sample_bytes)
+            fileobj.seek(pos)
+            encoding = _detect_encoding_bytes(sample)
+
+        parser = cls.__new__(cls)
+        parser.file_path = None
+        parser.stream = fileobj
+        parser.encoding = encoding
+        parser._init_config(layouts, numeric_columns, groups)
+        parser.metrics.arquivo_processado = name
+        return parser
+
+    def _read_lines(self) -> List[str]:
         """
-        parts = self._pad_line(raw_line, registro)
-        parts.append(self.indices['e110'])
-        self.rows[registro].append(parts)
+        Lê, decodifica e separa em linhas a fonte de dados inteira.
 
-    def _process_generic(self, registro: str, raw_line: str) -> None:
-        """
-        Processa um registro genérico sem tratamento especial.
+        Arquivos são mapeados via mmap (o kernel pagina o conteúdo sem
+        cópia extra em userspace); streams são lidos direto. O tamanho já é
+        limitado por MAX_FILE_SIZE, então materializar as linhas de uma vez
+        é seguro e deixa o ingest limitado por banda de memória, não por
+        bytecode Python.
 
-        Este método é utilizado para registros de abertura (por exemplo, C001, D001, A001, F001, M001, E001) e
-        quaisquer registros definidos em LAYOUTS que não possuam lógica específica.
-        Também aplica lógica de indexação dinâmica se configurada.
+        Returns:
+            Lista de linhas decodificadas, sem as quebras de linha
         """
-        parts = self._pad_line(raw_line, registro)
-        
-        # Aplica ações de indexação dinâmica
-        if registro in self.record_actions:
-            for action in self.record_actions[registro]:
-                key = action['key']
-                if action['type'] == 'increment':
-                    # Garante que o contador existe
-                    if key not in self.indices:
-                        self.indices[key] = -1
-                    self.indices[key] += 1
-                    parts.append(str(self.indices[key]))
-                elif action['type'] == 'read':
-                    val = self.indices.get(key, -1)
-                    parts.append(str(val))
-        
-        self.rows[registro].append(parts)
-
-    # ======== Bloco C500 ========
-    def _process_c500(self, raw_line: str) -> None:
-        """Processa registro C500 (nota de energia/serviço de comunicação com crédito)."""
-        self.indices['c500'] += 1
-        parts = self._pad_line(raw_line, 'C500')
-        # Adiciona índices: próprio e referência ao C010
-        parts.extend([self.indices['c500'], self.indices['c010']])
-        self.rows['C500'].append(parts)
-
-    def _process_c5_child(self, registro: str, raw_line: str) -> None:
-        """Processa registros filhos de C500 (C501, C505)."""
-        parts = self._pad_line(raw_line, registro)
-        # Adiciona índice do pai C500
-        parts.append(self.indices['c500'])
-        self.rows[registro].append(parts)
-
-    # ======== Bloco D500 ========
-    def _process_d500(self, raw_line: str) -> None:
-        """Processa registro D500 (nota de serviços de comunicação com crédito)."""
-        self.indices['d500'] += 1
-        parts = self._pad_line(raw_line, 'D500')
-        # Adiciona índices: próprio e referência ao D010
-        parts.extend([self.indices['d500'], self.indices['d010']])
-        self.rows['D500'].append(parts)
-
-    def _process_d5_child(self, registro: str, raw_line: str) -> None:
-        """Processa registros filhos de D500 (D501, D505)."""
-        parts = self._pad_line(raw_line, registro)
-        parts.append(self.indices['d500'])
-        self.rows[registro].append(parts)
-
-    # ======== Bloco D700 ========
-    def _process_d700(self, raw_line: str) -> None:
-        """Processa registro D700 (NFCom – nota fiscal fatura eletrônica)."""
-        self.indices['d700'] += 1
-        parts = self._pad_line(raw_line, 'D700')
-        # Adiciona índices: próprio e referência ao D010 (estabelecimento)
-        parts.extend([self.indices['d700'], self.indices['d010']])
-        self.rows['D700'].append(parts)
-    
-    def _pad_line(self, raw_line: str, registro: str) -> List[str]:
+        if self.stream is not None:
+            self.stream.seek(0)
+            data = self.stream.read()
+        else:
+            with self.file_path.open('rb') as f:
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        data = mm[:]
+                except (ValueError, OSError):
+                    # Arquivo vazio ou filesystem sem suporte a mmap
+                    f.seek(0)
+                    data = f.read()
+        return data.decode(self.encoding, errors='replace').splitlines()
+
+    def parse(self, progress_callback=None) -> Dict[str, pd.DataFrame]:
         """
-        Faz o parse e padding de uma linha para o tamanho esperado.
+        Faz o parse do arquivo SPED completo.
 
         Args:
-            raw_line: Linha bruta
-            registro: Código do registro
+            progress_callback: Função opcional chamada com (fração, mensagem)
+                durante o parse. As chamadas são limitadas a uma a cada
+                250 ms para não custar mais que o próprio processamento.
 
         Returns:
-            Lista de campos com padding
+            Dicionário com DataFrames para cada registro
+
+        Raises:
+            SpedParseError: Se houver erro crítico no parsing
         """
-        parts = parse_sped_line(raw_line)
-        if registro not in self.layouts:
-            return parts
+        logger.info(f"Iniciando parse do arquivo: {self.metrics.arquivo_processado}")
+        start_time = time.time()
+
+        try:
+            # Decodifica a fonte inteira de uma vez e separa as linhas em um
+            # único passe em C — substitui as duas varreduras do wrapper de
+            # texto (contagem de linhas + readline por linha)
+            lines = self._read_lines()
+            self.metrics.total_lines = len(lines)
+
+            total_lines = self.metrics.total_lines or 1
+            last_report = time.monotonic()
+
+            # Buffer de códigos de registro: a contagem vai para as
+            # métricas em lotes (um passe do Counter), não linha a linha
+            self._reg_batch = []
+            reg_batch = self._reg_batch
+
+            # Ligações locais do caminho quente: em um arquivo típico a
+            # maioria das linhas é de registros fora dos layouts, e cada
+            # lookup de atributo em self nessas linhas é puro overhead
+            dispatch_get = self._dispatch.get
+            metrics = self.metrics
+            intern = sys.intern
+            append_code = reg_batch.append
+
+            for line_number, raw_line in enumerate(lines, 1):
+                if progress_callback is not None:
+                    now = time.monotonic()
+                    if now - last_report >= 0.25:
+                        last_report = now
+                        progress_callback(line_number / total_lines,
+                                          f"Linha {line_number:,} de {total_lines:,}")
+
+                # Ignora linhas vazias, curtas demais ou sem pipe inicial.
+                # O teste é O(1): linhas vazias/em branco também falham no
+                # primeiro caractere, sem o strip() que alocava uma cópia
+                # da linha inteira só para detectá-las
+                if len(raw_line) < 6 or raw_line[0] != '|':
+                    metrics.skipped_lines += 1
+                    continue
+
+                # Interning: o fatiamento cria uma string nova por linha;
+                # internada, os lookups em layouts/rows comparam por identidade
+                registro = intern(raw_line[1:5])
+                append_code(registro)
+
+                # Registro fora dos layouts: só contabiliza e segue — nenhum
+                # split, pad ou alocação acontece para essas linhas
+                handler = dispatch_get(registro)
+                if handler is None:
+                    continue
+
+                try:
+                    handler(raw_line)
+                except SpedParseError as e:
+                    metrics.increment_erro("Parse Error")
+                    if self.strict_mode:
+                        raise
+                    logger.warning(str(e))
+                except Exception as e:
+                    metrics.increment_erro("Erro Desconhecido")
+                    logger.warning(f"Erro na linha {line_number}: {e}")
+                    if self.strict_mode:
+                        raise SpedParseError(
+                            f"Erro inesperado ao processar linha",
+                            line_number=line_number,
+                            line_content=raw_line
+                        ) from e
+
+                if len(reg_batch) >= 65536:
+                    metrics.bulk_increment(reg_batch)
+                    del reg_batch[:]
+
+            self.metrics.bulk_increment(reg_batch)
+            del reg_batch[:]
+
+            # Converte listas em DataFrames
+            dataframes = self._create_dataframes()
             
-        expected_len = len(self.layouts[registro])
-        
-        # Adiciona campos vazios se necessário
-        if len(parts) < expected_len:
-            parts.extend([''] * (expected_len - len(parts)))
+            # Finaliza métricas
+            self.metrics.finalizar()
+            self.metrics.log_summary()
+            
+            logger.info(f"Parse concluído em {time.time() - start_time:.2f}s. "
+                       f"{len(dataframes)} tipos de registro processados.")
+            
+            return dataframes
         
-        # Trunca se houver campos extras
-        return parts[:expected_len]
+        except Exception as e:
+            logger.error(f"Erro ao fazer parse do arquivo: {e}")
+            raise
     
     def _create_dataframes(self) -> Dict[str, pd.DataFrame]:
         """
@@ -985,11 +1146,21 @@ class SpedParser:
                 if code in self.layouts:
                     dataframes[code] = pd.DataFrame(columns=self.layouts[code])
                 continue
-            
-            # Define colunas baseado no tipo de registro
-            columns = self._get_columns_for_code(code)
-            dataframes[code] = pd.DataFrame(data, columns=columns)
-        
+
+            # Define colunas baseado no tipo de registro (cache do __init__)
+            columns = self._columns_cache[code]
+
+            # Uma atribuição única em um array object pré-alocado usa o
+            # caminho rápido do BlockManager, em vez da construção linha a
+            # linha com inferência por célula de pd.DataFrame(list-of-lists)
+            try:
+                arr = np.empty((len(data), len(columns)), dtype=object)
+                arr[:] = data
+                dataframes[code] = pd.DataFrame(arr, columns=columns)
+            except ValueError:
+                # Linhas de tamanho irregular (layout externo inconsistente)
+                dataframes[code] = pd.DataFrame(data, columns=columns)
+
         return dataframes
     
     def _get_columns_for_code(self, code: str) -> List[str]:
@@ -1023,26 +1194,35 @@ class SpedDataProcessor:
     """Processa e transforma dados SPED."""
     
     @staticmethod
-    def convert_dataframes(dataframes: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    def convert_dataframes(dataframes: Dict[str, pd.DataFrame],
+                           numeric_columns: Dict[str, List[str]] = None) -> Dict[str, pd.DataFrame]:
         """
         Converte campos numéricos e de data nos DataFrames.
 
         Args:
             dataframes: Dicionário com DataFrames
+            numeric_columns: Dicionário opcional de colunas numéricas por
+                registro (padrão: NUMERIC_COLUMNS do módulo)
 
         Returns:
             Dicionário com DataFrames convertidos
         """
         logger.info("Convertendo campos numéricos e datas")
-        
+
+        if numeric_columns is None:
+            numeric_columns = NUMERIC_COLUMNS
+
         for code, df in dataframes.items():
             if df.empty:
                 continue
-            
-            # Converte campos numéricos
-            if code in NUMERIC_COLUMNS:
-                convert_numeric_columns(df, NUMERIC_COLUMNS[code])
-            
+
+            # Converte campos numéricos (interseção calculada uma única vez,
+            # para que o loop interno seja só passes vetorizados do pandas)
+            if code in numeric_columns:
+                cols = [c for c in numeric_columns[code] if c in df.columns]
+                if cols:
+                    convert_numeric_columns(df, cols)
+
             # Converte e mapeia campos específicos
             SpedDataProcessor._convert_specific_fields(code, df)
         
@@ -1060,89 +1240,89 @@ class SpedDataProcessor:
         # Bloco C100
         if code == 'C100':
             if 'IND_OPER' in df.columns:
-                df['IND_OPER'] = df['IND_OPER'].map(IND_OPER_MAP).fillna(df['IND_OPER'])
+                df['IND_OPER'] = map_codes(df['IND_OPER'], IND_OPER_MAP)
             if 'IND_EMIT' in df.columns:
-                df['IND_EMIT'] = df['IND_EMIT'].map(IND_EMIT_MAP).fillna(df['IND_EMIT'])
+                df['IND_EMIT'] = map_codes(df['IND_EMIT'], IND_EMIT_MAP)
             if 'IND_FRT' in df.columns:
-                df['IND_FRT'] = df['IND_FRT'].map(IND_FRT_MAP).fillna(df['IND_FRT'])
+                df['IND_FRT'] = map_codes(df['IND_FRT'], IND_FRT_MAP)
             if 'DT_DOC' in df.columns:
-                df['DT_DOC_DATE'] = pd.to_datetime(df['DT_DOC'], format='%Y%m%d', errors='coerce')
+                df['DT_DOC_DATE'] = parse_dates_unique(df['DT_DOC'], '%Y%m%d')
             if 'DT_E_S' in df.columns:
-                df['DT_E_S_DATE'] = pd.to_datetime(df['DT_E_S'], format='%Y%m%d', errors='coerce')
+                df['DT_E_S_DATE'] = parse_dates_unique(df['DT_E_S'], '%Y%m%d')
         
         # Bloco D100
         elif code == 'D100':
             if 'IND_OPER' in df.columns:
-                df['IND_OPER'] = df['IND_OPER'].map(IND_OPER_MAP).fillna(df['IND_OPER'])
+                df['IND_OPER'] = map_codes(df['IND_OPER'], IND_OPER_MAP)
             if 'IND_EMIT' in df.columns:
-                df['IND_EMIT'] = df['IND_EMIT'].map(IND_EMIT_MAP).fillna(df['IND_EMIT'])
+                df['IND_EMIT'] = map_codes(df['IND_EMIT'], IND_EMIT_MAP)
             if 'IND_FRT' in df.columns:
-                df['IND_FRT'] = df['IND_FRT'].map(IND_FRT_MAP).fillna(df['IND_FRT'])
+                df['IND_FRT'] = map_codes(df['IND_FRT'], IND_FRT_MAP)
             if 'DT_DOC' in df.columns:
-                df['DT_DOC_DATE'] = pd.to_datetime(df['DT_DOC'], format='%d%m%Y', errors='coerce')
+                df['DT_DOC_DATE'] = parse_dates_unique(df['DT_DOC'], '%d%m%Y')
             if 'DT_A_P' in df.columns:
-                df['DT_A_P_DATE'] = pd.to_datetime(df['DT_A_P'], format='%d%m%Y', errors='coerce')
+                df['DT_A_P_DATE'] = parse_dates_unique(df['DT_A_P'], '%d%m%Y')
         
         # Bloco A100
         elif code == 'A100':
             if 'DT_DOC' in df.columns:
-                df['DT_DOC_DATE'] = pd.to_datetime(df['DT_DOC'], format='%Y%m%d', errors='coerce')
+                df['DT_DOC_DATE'] = parse_dates_unique(df['DT_DOC'], '%Y%m%d')
             if 'DT_EXE_SERV' in df.columns:
-                df['DT_EXE_SERV_DATE'] = pd.to_datetime(df['DT_EXE_SERV'], format='%Y%m%d', errors='coerce')
+                df['DT_EXE_SERV_DATE'] = parse_dates_unique(df['DT_EXE_SERV'], '%Y%m%d')
 
         # Bloco E100 - Período de apuração
         elif code == 'E100':
             if 'DT_INI' in df.columns:
-                df['DT_INI_DATE'] = pd.to_datetime(df['DT_INI'], format='%Y%m%d', errors='coerce')
+                df['DT_INI_DATE'] = parse_dates_unique(df['DT_INI'], '%Y%m%d')
             if 'DT_FIN' in df.columns:
-                df['DT_FIN_DATE'] = pd.to_datetime(df['DT_FIN'], format='%Y%m%d', errors='coerce')
+                df['DT_FIN_DATE'] = parse_dates_unique(df['DT_FIN'], '%Y%m%d')
 
         # Bloco E113 - Informações adicionais dos ajustes (doc fiscal)
         elif code == 'E113':
             if 'DT_DOC' in df.columns:
-                df['DT_DOC_DATE'] = pd.to_datetime(df['DT_DOC'], format='%Y%m%d', errors='coerce')
+                df['DT_DOC_DATE'] = parse_dates_unique(df['DT_DOC'], '%Y%m%d')
 
         # Bloco E116 - Obrigações a recolher
         elif code == 'E116':
             if 'DT_VCTO' in df.columns:
-                df['DT_VCTO_DATE'] = pd.to_datetime(df['DT_VCTO'], format='%Y%m%d', errors='coerce')
+                df['DT_VCTO_DATE'] = parse_dates_unique(df['DT_VCTO'], '%Y%m%d')
             if 'MES_REF' in df.columns:
                 # Tenta interpretar MES_REF (MMYYYY) como data no primeiro dia do mês
-                df['MES_REF_DATE'] = pd.to_datetime(df['MES_REF'].str.zfill(6) + '01', format='%m%Y%d', errors='coerce')
+                df['MES_REF_DATE'] = parse_dates_unique(df['MES_REF'].str.zfill(6) + '01', '%m%Y%d')
 
         # Bloco C500
         elif code == 'C500':
             # Datas de emissão e entrada
             if 'DT_DOC' in df.columns:
-                df['DT_DOC_DATE'] = pd.to_datetime(df['DT_DOC'], format='%Y%m%d', errors='coerce')
+                df['DT_DOC_DATE'] = parse_dates_unique(df['DT_DOC'], '%Y%m%d')
             if 'DT_ENT' in df.columns:
-                df['DT_ENT_DATE'] = pd.to_datetime(df['DT_ENT'], format='%Y%m%d', errors='coerce')
+                df['DT_ENT_DATE'] = parse_dates_unique(df['DT_ENT'], '%Y%m%d')
 
         # Bloco D500
         elif code == 'D500':
             # Mapeia indicadores
             if 'IND_OPER' in df.columns:
-                df['IND_OPER'] = df['IND_OPER'].map(IND_OPER_MAP).fillna(df['IND_OPER'])
+                df['IND_OPER'] = map_codes(df['IND_OPER'], IND_OPER_MAP)
             if 'IND_EMIT' in df.columns:
-                df['IND_EMIT'] = df['IND_EMIT'].map(IND_EMIT_MAP).fillna(df['IND_EMIT'])
+                df['IND_EMIT'] = map_codes(df['IND_EMIT'], IND_EMIT_MAP)
             # Datas de emissão e aquisição
             if 'DT_DOC' in df.columns:
-                df['DT_DOC_DATE'] = pd.to_datetime(df['DT_DOC'], format='%Y%m%d', errors='coerce')
+                df['DT_DOC_DATE'] = parse_dates_unique(df['DT_DOC'], '%Y%m%d')
             if 'DT_A_P' in df.columns:
-                df['DT_A_P_DATE'] = pd.to_datetime(df['DT_A_P'], format='%Y%m%d', errors='coerce')
+                df['DT_A_P_DATE'] = parse_dates_unique(df['DT_A_P'], '%Y%m%d')
 
         # Bloco D700
         elif code == 'D700':
             # Mapeia indicadores
             if 'IND_OPER' in df.columns:
-                df['IND_OPER'] = df['IND_OPER'].map(IND_OPER_MAP).fillna(df['IND_OPER'])
+                df['IND_OPER'] = map_codes(df['IND_OPER'], IND_OPER_MAP)
             if 'IND_EMIT' in df.columns:
-                df['IND_EMIT'] = df['IND_EMIT'].map(IND_EMIT_MAP).fillna(df['IND_EMIT'])
+                df['IND_EMIT'] = map_codes(df['IND_EMIT'], IND_EMIT_MAP)
             # Datas de emissão e entrada/saída
             if 'DT_DOC' in df.columns:
-                df['DT_DOC_DATE'] = pd.to_datetime(df['DT_DOC'], format='%Y%m%d', errors='coerce')
+                df['DT_DOC_DATE'] = parse_dates_unique(df['DT_DOC'], '%Y%m%d')
             if 'DT_E_S' in df.columns:
-                df['DT_E_S_DATE'] = pd.to_datetime(df['DT_E_S'], format='%Y%m%d', errors='coerce')
+                df['DT_E_S_DATE'] = parse_dates_unique(df['DT_E_S'], '%Y%m%d')
     
     @staticmethod
     def consolidate_group_new(
@@ -1174,36 +1354,36 @@ class SpedDataProcessor:
         # Prepara resultado inicial (apenas pai)
         result = dataframes[parent_code].copy().reset_index(drop=True)
         
-        # Garante tipo str no índice do pai
+        # Normaliza o índice do pai para int64: o merge em chave int64 usa o
+        # caminho de hash em C do numpy, bem mais rápido que chaves object
         if parent_index_col in result.columns:
-            result[parent_index_col] = result[parent_index_col].astype(str)
-        
+            result[parent_index_col] = result[parent_index_col].astype('int64')
+
         for code in child_codes:
             child = dataframes.get(code)
             if child is None or child.empty:
                 continue
-            
-            child = child.copy()
-            
-            # Garante tipo str no índice do filho
-            if parent_index_col in child.columns:
-                child[parent_index_col] = child[parent_index_col].astype(str)
-            else:
-                # Se filho não tem a chave do pai, não dá pra juntar
+
+            # Se filho não tem a chave do pai, não dá pra juntar
+            if parent_index_col not in child.columns:
                 continue
-            
+
             # Seleciona colunas para manter (exceto chaves e REG)
             keep_cols = [c for c in child.columns if c not in ['REG', parent_index_col]]
-            
+
             if not keep_cols:
                 continue
 
             # Renomeia colunas do filho com prefixo para evitar colisão
             rename_map = {c: f'{code}_{c}' for c in keep_cols}
-            
-            # Prepara dataframe do filho para o merge
-            # Mantém parent_index_col para usar como chave
+
+            # Prepara dataframe do filho para o merge direto da seleção de
+            # colunas (já é uma cópia — o copy() integral do filho era
+            # tráfego de memória redundante)
             child_to_merge = child[[parent_index_col] + keep_cols].rename(columns=rename_map)
+
+            # Normaliza o índice do filho para int64 (mesma chave do pai)
+            child_to_merge[parent_index_col] = child_to_merge[parent_index_col].astype('int64')
             
             # Faz o Merge (Left Join)
             # Isso vai multiplicar as linhas do pai para cada linha do filho (Explosão)
@@ -1239,11 +1419,11 @@ class SpedDataProcessor:
             columns={c: f'{header_prefix}{c}' for c in keep_cols}
         )
         
-        # Faz o merge e garante tipos compatíveis
+        # Faz o merge em chave int64 (hash em C, sem objetos Python)
         if parent_header_index_col in df.columns:
-            df[parent_header_index_col] = df[parent_header_index_col].astype(str)
+            df[parent_header_index_col] = df[parent_header_index_col].astype('int64')
         if parent_header_index_col in join_df.columns:
-            join_df[parent_header_index_col] = join_df[parent_header_index_col].astype(str)
+            join_df[parent_header_index_col] = join_df[parent_header_index_col].astype('int64')
             
         merged = df.merge(join_df, how='left', left_on=parent_header_index_col, right_on=parent_header_index_col)
         
@@ -1258,9 +1438,26 @@ class SpedDataProcessor:
 # EXPORTAÇÃO PARA EXCEL
 # =========================
 
+# Acima deste número de linhas em qualquer planilha, o workbook inteiro é
+# gravado pelo engine de streaming (xlsxwriter) em vez do openpyxl
+LARGE_SHEET_ROWS = 50_000
+
+# Palavras-chave de colunas monetárias em uma única alternação compilada:
+# um passe em C sobre o nome, em vez de até 14 buscas de substring
+_CURRENCY_RE = re.compile(
+    r'VL_|BC|ICMS|IPI|PIS|COFINS|SERV|OPR|MERC|DESC|FRT|SEG|OUT|ISS'
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _is_currency_column(column_name: str) -> bool:
+    """Decide (com memoização) se o nome de coluna indica valor monetário."""
+    return bool(_CURRENCY_RE.search(str(column_name).upper()))
+
+
 class ExcelExporter:
     """Exporta dados para Excel com formatação."""
-    
+
     @staticmethod
     def should_format_as_currency(column_name: str) -> bool:
         """
@@ -1272,17 +1469,7 @@ class ExcelExporter:
         Returns:
             True se deve ser formatada como moeda
         """
-        upper_name = str(column_name).upper()
-        
-        if upper_name.startswith('VL_') or 'VL_' in upper_name:
-            return True
-        
-        currency_keywords = [
-            'BC', 'ICMS', 'IPI', 'PIS', 'COFINS', 'SERV',
-            'OPR', 'MERC', 'DESC', 'FRT', 'SEG', 'OUT', 'ISS'
-        ]
-        
-        return any(keyword in upper_name for keyword in currency_keywords)
+        return _is_currency_column(column_name)
     
     @staticmethod
     def apply_currency_format(writer: pd.ExcelWriter, df: pd.DataFrame, sheet_name: str) -> None:
@@ -1295,31 +1482,82 @@ class ExcelExporter:
             sheet_name: Nome da planilha
         """
         try:
-            from openpyxl.utils import get_column_letter
-            
             worksheet = writer.sheets[sheet_name]
-            
-            # Identifica colunas numéricas que devem ser formatadas
-            numeric_cols = {c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])}
+
+            # Identifica colunas numéricas pelo dtype.kind direto: testar
+            # df[c] coluna a coluna materializa uma Series (e povoa o
+            # _item_cache) por coluna só para olhar o dtype
+            numeric_cols = {c for c, d in zip(df.columns, df.dtypes.values)
+                            if d.kind in 'iufcb'}
             currency_cols = {c for c in df.columns if ExcelExporter.should_format_as_currency(c)}
             cols_to_format = list(numeric_cols.union(currency_cols))
-            
+
+            max_row = worksheet.max_row
+
+            # Nada a formatar (sem colunas candidatas ou só o cabeçalho):
+            # evita o loop e a materialização das células
+            if not cols_to_format or max_row < 2:
+                return
+
+            # cols_to_format vem de df.columns: o dicionário resolve a
+            # posição em O(1) sem o get_loc (que materializa o hash engine
+            # do Index) nem o teste redundante de pertinência
+            name_to_idx = {c: i + 1 for i, c in enumerate(df.columns)}
+
             for col_name in cols_to_format:
-                if col_name not in df.columns:
-                    continue
-                
-                col_index = df.columns.get_loc(col_name) + 1
-                col_letter = get_column_letter(col_index)
-                
-                # Aplica formato a todas as células da coluna (exceto cabeçalho)
-                for row in range(2, worksheet.max_row + 1):
-                    cell = worksheet[f'{col_letter}{row}']
-                    if isinstance(cell.value, (int, float)):
-                        cell.number_format = BRL_ACCOUNTING
-        
+                col_index = name_to_idx[col_name]
+
+                # iter_cols entrega as células já materializadas, sem o
+                # parse de referência 'A2' que worksheet[...] fazia por
+                # célula; colunas numéricas dispensam o isinstance por valor
+                is_numeric = col_name in numeric_cols
+                for cells in worksheet.iter_cols(min_col=col_index, max_col=col_index,
+                                                 min_row=2, max_row=max_row):
+                    if is_numeric:
+                        for cell in cells:
+                            cell.number_format = BRL_ACCOUNTING
+                    else:
+                        for cell in cells:
+                            if isinstance(cell.value, (int, float)):
+                                cell.number_format = BRL_ACCOUNTING
+
         except Exception as e:
             logger.warning(f"Erro ao aplicar formatação de moeda: {e}")
-    
+
+    @staticmethod
+    def _apply_currency_format_xlsxwriter(writer: pd.ExcelWriter, df: pd.DataFrame,
+                                          sheet_name: str) -> None:
+        """
+        Aplica formatação de moeda no engine xlsxwriter (formato por coluna).
+
+        Um único Format por planilha, aplicado via set_column — nenhum loop
+        por célula, independente do número de linhas.
+
+        Args:
+            writer: ExcelWriter do pandas (engine xlsxwriter)
+            df: DataFrame
+            sheet_name: Nome da planilha
+        """
+        try:
+            numeric_cols = {c for c, d in zip(df.columns, df.dtypes.values)
+                            if d.kind in 'iufcb'}
+            currency_cols = {c for c in df.columns if ExcelExporter.should_format_as_currency(c)}
+            cols_to_format = numeric_cols.union(currency_cols)
+
+            if not cols_to_format:
+                return
+
+            worksheet = writer.sheets[sheet_name]
+            fmt = writer.book.add_format({'num_format': BRL_ACCOUNTING})
+
+            name_to_idx = {c: i for i, c in enumerate(df.columns)}
+            for col_name in cols_to_format:
+                col_index = name_to_idx[col_name]
+                worksheet.set_column(col_index, col_index, None, fmt)
+
+        except Exception as e:
+            logger.warning(f"Erro ao aplicar formatação de moeda: {e}")
+
     @staticmethod
     def write_excel(sheets: Dict[str, pd.DataFrame], output_path: Path) -> None:
         """
@@ -1330,9 +1568,27 @@ class ExcelExporter:
             output_path: Caminho do arquivo de saída
         """
         logger.info(f"Exportando para Excel: {output_path}")
-        
+
+        # Especialização por tamanho: workbooks com alguma planilha grande
+        # vão para o xlsxwriter (serializa as células direto para XML, sem
+        # montar o modelo completo em memória); workbooks só de planilhas
+        # pequenas ficam no openpyxl, cujo custo aqui é irrelevante e que
+        # formata célula a célula (só valores de fato numéricos)
+        has_large_sheet = any(
+            df is not None and len(df) > LARGE_SHEET_ROWS
+            for df in sheets.values()
+        )
+        if has_large_sheet:
+            try:
+                import xlsxwriter  # noqa: F401
+                engine = 'xlsxwriter'
+            except ImportError:
+                engine = 'openpyxl'
+        else:
+            engine = 'openpyxl'
+
         try:
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+            with pd.ExcelWriter(output_path, engine=engine) as writer:
                 for sheet_name, df in sheets.items():
                     if df is None or df.empty:
                         logger.warning(f"Planilha {sheet_name} vazia, pulando")
@@ -1357,7 +1613,10 @@ class ExcelExporter:
                             'E110', 'E111', 'E113', 'E115', 'E116'
                         ]
                     ):
-                        ExcelExporter.apply_currency_format(writer, df, sheet_name)
+                        if engine == 'xlsxwriter':
+                            ExcelExporter._apply_currency_format_xlsxwriter(writer, df, sheet_name)
+                        else:
+                            ExcelExporter.apply_currency_format(writer, df, sheet_name)
             
             logger.info(f"Arquivo Excel criado com sucesso: {output_path}")
         
@@ -1365,19 +1624,113 @@ class ExcelExporter:
             logger.error(f"Erro ao criar arquivo Excel: {e}")
             raise
 
+    @staticmethod
+    def write_tabular(sheets: Dict[str, pd.DataFrame], output_dir: Path,
+                      fmt: str) -> None:
+        """
+        Escreve as planilhas como arquivos colunares (parquet) ou csv.
+
+        Para saídas grandes consumidas por pandas/BI em vez de abertas no
+        Excel, parquet é uma ordem de grandeza mais rápido de gravar que
+        xlsx e ocupa cerca de metade do espaço.
+
+        Args:
+            sheets: Dicionário com nome da planilha e DataFrame
+            output_dir: Diretório de saída (um arquivo por planilha)
+            fmt: 'parquet' ou 'csv'
+        """
+        logger.info(f"Exportando {fmt} para: {output_dir}")
+
+        try:
+            output_dir.mkdir(parents=True, exist_ok=True)
+
+            for sheet_name, df in sheets.items():
+                if df is None or df.empty:
+                    logger.warning(f"Planilha {sheet_name} vazia, pulando")
+                    continue
+
+                if fmt == 'parquet':
+                    df.to_parquet(output_dir / f'{sheet_name}.parquet',
+                                  compression='zstd')
+                else:
+                    df.to_csv(output_dir / f'{sheet_name}.csv', index=False)
+
+            logger.info(f"Arquivos {fmt} criados com sucesso em: {output_dir}")
+
+        except Exception as e:
+            logger.error(f"Erro ao criar arquivos {fmt}: {e}")
+            raise
+
 
 # =========================
 # PIPELINE PRINCIPAL
 # =========================
 
+# Cache em disco dos resultados consolidados, chaveado por caminho + mtime
+# + tamanho: reprocessar o mesmo arquivo entre execuções vira leitura de
+# parquet
+_RESULT_CACHE_DIR = Path.home() / '.cache' / 'sped_extrator'
+_RESULT_CACHE_MAX_ENTRIES = 16
+
+
 class SpedProcessor:
     """Processador principal de arquivos SPED."""
-    
+
+    @staticmethod
+    def _result_cache_dir(input_path: Path, stat_result: os.stat_result) -> Path:
+        """Deriva o diretório de cache de um arquivo a partir do stat."""
+        import hashlib
+        key = hashlib.sha1(
+            f'{_resolve_path(str(input_path))}:{stat_result.st_mtime_ns}:'
+            f'{stat_result.st_size}'.encode()
+        ).hexdigest()
+        return _RESULT_CACHE_DIR / key
+
+    @staticmethod
+    def _load_cached_result(cache_dir: Path) -> Optional[Dict[str, pd.DataFrame]]:
+        """Carrega um resultado consolidado do cache em disco, se existir."""
+        if not cache_dir.is_dir():
+            return None
+        try:
+            result = {}
+            for part in sorted(cache_dir.glob('*.parquet')):
+                # Nome no formato NN__NOME_DA_PLANILHA.parquet
+                sheet_name = part.stem.split('__', 1)[1]
+                result[sheet_name] = pd.read_parquet(part)
+            # Toca o diretório para a varredura LRU
+            os.utime(cache_dir)
+            return result
+        except Exception as e:
+            logger.warning(f"Cache de resultados ilegível, reprocessando: {e}")
+            return None
+
+    @staticmethod
+    def _store_cached_result(cache_dir: Path, result: Dict[str, pd.DataFrame]) -> None:
+        """Persiste um resultado consolidado e poda entradas antigas."""
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            for i, (sheet_name, df) in enumerate(result.items()):
+                df.to_parquet(cache_dir / f'{i:02d}__{sheet_name}.parquet')
+
+            # Varredura LRU simples: remove os diretórios menos usados
+            entries = sorted(_RESULT_CACHE_DIR.iterdir(),
+                             key=lambda p: p.stat().st_mtime)
+            for stale in entries[:-_RESULT_CACHE_MAX_ENTRIES]:
+                for part in stale.glob('*.parquet'):
+                    part.unlink()
+                stale.rmdir()
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar cache de resultados: {e}")
+
     @staticmethod
     def process_single_file(input_path: Path) -> Dict[str, pd.DataFrame]:
         """
         Processa um único arquivo SPED.
 
+        Resultados são memoizados em disco por (caminho, mtime, tamanho):
+        reprocessar um arquivo inalterado entre execuções lê os parquets do
+        cache em vez de parsear e consolidar de novo.
+
         Args:
             input_path: Caminho do arquivo de entrada
 
@@ -1385,12 +1738,20 @@ class SpedProcessor:
             Dicionário com planilhas consolidadas
         """
         logger.info(f"Processando arquivo: {input_path}")
-        
-        # Valida arquivo
-        validate_file_path(input_path)
-        
+
+        # Valida arquivo (o stat resultante é reaproveitado pelo parser)
+        stat_result = validate_file_path(input_path)
+
+        use_cache = get_config('processing.enable_result_cache', True)
+        cache_dir = SpedProcessor._result_cache_dir(input_path, stat_result)
+        if use_cache:
+            cached = SpedProcessor._load_cached_result(cache_dir)
+            if cached is not None:
+                logger.info(f"Resultado recuperado do cache: {input_path}")
+                return cached
+
         # Parse
-        parser = SpedParser(input_path)
+        parser = SpedParser(input_path, stat_result=stat_result)
         dataframes = parser.parse()
         
         # Converte campos
@@ -1422,7 +1783,10 @@ class SpedProcessor:
                 )
             
             consolidated[f'{group_name}_CONSOLIDADO'] = consolidated_df
-        
+
+        if use_cache:
+            SpedProcessor._store_cached_result(cache_dir, consolidated)
+
         return consolidated
     
     @staticmethod
@@ -1437,16 +1801,25 @@ class SpedProcessor:
             Dicionário com planilhas consolidadas
         """
         logger.info(f"Processando {len(input_paths)} arquivo(s)")
-        
-        results = []
-        for path in input_paths:
-            try:
-                result = SpedProcessor.process_single_file(path)
-                results.append(result)
-            except Exception as e:
-                logger.error(f"Erro ao processar {path}: {e}")
-                raise
-        
+
+        # Um arquivo só não paga o custo de subir workers
+        if len(input_paths) <= 1:
+            results = [SpedProcessor.process_single_file(p) for p in input_paths]
+            return SpedProcessor._concat_results(results)
+
+        # Arquivos são independentes entre si: parse + consolidação escalam
+        # quase linearmente com os núcleos em um pool de processos
+        from concurrent.futures import ProcessPoolExecutor
+
+        max_workers = min(len(input_paths), os.cpu_count() or 1)
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(SpedProcessor.process_single_file,
+                                            input_paths))
+        except Exception as e:
+            logger.error(f"Erro ao processar arquivos em paralelo: {e}")
+            raise
+
         # Concatena resultados
         return SpedProcessor._concat_results(results)
     
@@ -1461,13 +1834,23 @@ class SpedProcessor:
         Returns:
             Dicionário com DataFrames concatenados
         """
-        all_keys = set().union(*[set(d.keys()) for d in results])
+        # União via dict.fromkeys: nenhum set intermediário por arquivo e a
+        # ordem de inserção é estável — as planilhas saem sempre na mesma
+        # ordem no Excel entre execuções
+        all_keys = dict.fromkeys(k for d in results for k in d)
         concatenated = {}
-        
+
         for key in all_keys:
             frames = [res[key] for res in results if key in res and not res[key].empty]
-            concatenated[key] = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
-        
+            if not frames:
+                concatenated[key] = pd.DataFrame()
+            elif len(frames) == 1:
+                # Arquivo único com essa planilha: adota o frame direto,
+                # sem passar pelo concat
+                concatenated[key] = frames[0]
+            else:
+                concatenated[key] = pd.concat(frames, ignore_index=True, copy=False)
+
         return concatenated
 
 
@@ -1475,26 +1858,32 @@ class SpedProcessor:
 # INTERFACE DE LINHA DE COMANDO E GUI
 # =========================
 
-def main_cli(input_files: List[str], output_file: str) -> None:
+def main_cli(input_files: List[str], output_file: str,
+             output_format: str = 'xlsx') -> None:
     """
     Função principal para interface de linha de comando.
 
     Args:
         input_files: Lista de caminhos de arquivos de entrada
-        output_file: Caminho do arquivo de saída
+        output_file: Caminho do arquivo de saída (ou diretório, para os
+            formatos csv/parquet — uma tabela por planilha)
+        output_format: Formato de saída ('xlsx', 'csv' ou 'parquet')
     """
     try:
         input_paths = [Path(f) for f in input_files]
         output_path = Path(output_file)
-        
+
         # Processa arquivos
         consolidated = SpedProcessor.process_multiple_files(input_paths)
-        
-        # Exporta para Excel
-        ExcelExporter.write_excel(consolidated, output_path)
-        
+
+        # Exporta no formato pedido
+        if output_format == 'xlsx':
+            ExcelExporter.write_excel(consolidated, output_path)
+        else:
+            ExcelExporter.write_tabular(consolidated, output_path, output_format)
+
         logger.info("Processamento concluído com sucesso!")
-    
+
     except Exception as e:
         logger.error(f"Erro no processamento: {e}")
         raise
@@ -1504,6 +1893,7 @@ def run_gui() -> None:
     """Executa interface gráfica com barra de progresso."""
     import tkinter as tk
     from tkinter import filedialog, messagebox, ttk
+    import queue
     import threading
     
     # Carrega configurações da GUI
@@ -1546,31 +1936,56 @@ def run_gui() -> None:
             logger.info(f"Arquivo de saída: {path}")
     
     def process_files():
-        """Processa os arquivos selecionados."""
+        """Processa os arquivos selecionados em uma thread de trabalho."""
         if not input_paths:
             messagebox.showwarning("Atenção", "Selecione pelo menos um arquivo SPED (.txt).")
             return
-        
+
         if not output_var.get():
             messagebox.showwarning("Atenção", "Escolha onde salvar o arquivo Excel (.xlsx).")
             return
-        
+
         button_process.config(state="disabled")
         status_var.set("Processando arquivos...")
-        root.update_idletasks()
-        
-        try:
-            main_cli([str(p) for p in input_paths], output_var.get())
-            status_var.set("Processamento concluído com sucesso!")
-            messagebox.showinfo("Sucesso", f"Arquivo gerado:\n{output_var.get()}")
-        
-        except Exception as e:
-            status_var.set("Erro no processamento.")
-            messagebox.showerror("Erro", f"Erro ao processar arquivos:\n{str(e)}")
-            logger.error(f"Erro na GUI: {e}")
-        
-        finally:
+        progress_var.set(0)
+
+        inputs = [str(p) for p in input_paths]
+        output_path = output_var.get()
+        result_queue = queue.Queue()
+
+        # O trabalho pesado roda fora da thread do Tk: a janela continua
+        # respondendo e a barra de progresso de fato anda durante o
+        # processamento, em vez de congelar até o fim
+        def worker():
+            try:
+                main_cli(inputs, output_path)
+                result_queue.put(('ok', None))
+            except Exception as e:
+                logger.error(f"Erro na GUI: {e}")
+                result_queue.put(('erro', str(e)))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+        def poll_result():
+            try:
+                status, detail = result_queue.get_nowait()
+            except queue.Empty:
+                # Pulso visual enquanto o worker não termina
+                progress_var.set((progress_var.get() + 2) % 100)
+                root.after(200, poll_result)
+                return
+
             button_process.config(state="normal")
+            if status == 'ok':
+                progress_var.set(100)
+                status_var.set("Processamento concluído com sucesso!")
+                messagebox.showinfo("Sucesso", f"Arquivo gerado:\n{output_path}")
+            else:
+                progress_var.set(0)
+                status_var.set("Erro no processamento.")
+                messagebox.showerror("Erro", f"Erro ao processar arquivos:\n{detail}")
+
+        root.after(200, poll_result)
     
     # Layout da interface
     frame = tk.Frame(root, padx=20, pady=20)
@@ -1661,6 +2076,18 @@ Exemplos de uso:
         help="Caminho do arquivo Excel de saída (.xlsx)"
     )
     
+    parser.add_argument(
+        "--format",
+        choices=['xlsx', 'csv', 'parquet'],
+        default='xlsx',
+        help=(
+            "Formato de saída (padrão: xlsx). Para planilhas consolidadas "
+            "grandes consumidas por outras ferramentas, parquet grava uma "
+            "ordem de grandeza mais rápido e em cerca de metade do espaço; "
+            "csv/parquet tratam --out como diretório (uma tabela por planilha)"
+        )
+    )
+
     parser.add_argument(
         "--log-level",
         choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
@@ -1670,11 +2097,12 @@ Exemplos de uso:
     
     args = parser.parse_args()
     
-    # Configura nível de log
-    logging.getLogger().setLevel(getattr(logging, args.log_level))
+    # Ponto de entrada de aplicação: instala o handler no root logger (o
+    # NullHandler do módulo é só para quem importa como biblioteca)
+    logging.basicConfig(level=getattr(logging, args.log_level))
     
     # Executa CLI ou GUI
     if args.inputs and args.out:
-        main_cli(args.inputs, args.out)
+        main_cli(args.inputs, args.out, args.format)
     else:
         run_gui()
@@ -8,10 +8,17 @@ integridade referencial dos dados SPED.
 import re
 from datetime import datetime
 from typing import List, Optional, Dict, Any
+import numpy as np
 import pandas as pd
 
 from exceptions import SpedValidationError, SpedIntegrityError
 
+# Tabela de deleção pré-computada: translate remove os não-dígitos em um
+# único passe em C, sem acionar o motor de regex a cada CNPJ/chave
+_NON_DIGITS = str.maketrans('', '', ''.join(
+    chr(c) for c in range(256) if not chr(c).isdigit()
+))
+
 
 def validate_cnpj(cnpj: str) -> bool:
     """
@@ -34,8 +41,11 @@ def validate_cnpj(cnpj: str) -> bool:
     if not cnpj:
         return False
     
-    # Remove caracteres não numéricos
-    cnpj = re.sub(r'[^0-9]', '', cnpj)
+    # Remove caracteres não numéricos (a tabela cobre latin-1; entradas
+    # com caracteres fora dela caem no caminho raro do regex)
+    cnpj = cnpj.translate(_NON_DIGITS)
+    if cnpj and not cnpj.isascii():
+        cnpj = re.sub(r'[^0-9]', '', cnpj)
     
     # Verifica se tem 14 dígitos
     if len(cnpj) != 14:
@@ -69,6 +79,55 @@ def validate_cnpj(cnpj: str) -> bool:
     return int(cnpj[13]) == digito2
 
 
+# Pesos dos dígitos verificadores do CNPJ
+_CNPJ_W1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], dtype=np.int16)
+_CNPJ_W2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], dtype=np.int16)
+
+
+def validate_cnpj_series(series: pd.Series) -> pd.Series:
+    """
+    Valida uma coluna inteira de CNPJs de forma vetorizada.
+
+    Mesmas regras de validate_cnpj (14 dígitos, não repetido, dígitos
+    verificadores), mas os dois dígitos saem de duas multiplicações de
+    matriz sobre um array (n, 14) — sem o loop Python por CNPJ, que é
+    proibitivo para colunas COD_PART com centenas de milhares de linhas.
+
+    Args:
+        series: Série com CNPJs (com ou sem formatação)
+
+    Returns:
+        Série booleana com o mesmo índice (True = CNPJ válido)
+    """
+    result = pd.Series(False, index=series.index)
+    if series.empty:
+        return result
+
+    digits_only = series.astype(str).str.replace(r'\D', '', regex=True)
+    mask = digits_only.str.len() == 14
+    if not mask.any():
+        return result
+
+    # Empilha os dígitos em uma matriz (n, 14) de inteiros via os bytes
+    # ASCII concatenados — uma alocação, nenhuma conversão por caractere
+    arr = np.frombuffer(
+        digits_only[mask].str.cat().encode('ascii'), dtype=np.uint8
+    ).reshape(-1, 14).astype(np.int16) - ord('0')
+
+    d1 = arr[:, :12] @ _CNPJ_W1 % 11
+    d1 = np.where(d1 < 2, 0, 11 - d1)
+    d2 = arr[:, :13] @ _CNPJ_W2 % 11
+    d2 = np.where(d2 < 2, 0, 11 - d2)
+
+    valid = (
+        (arr[:, 12] == d1)
+        & (arr[:, 13] == d2)
+        & (arr != arr[:, :1]).any(axis=1)
+    )
+    result[mask] = valid
+    return result
+
+
 def validate_date_format(date_str: str, format_str: str) -> bool:
     """
     Valida se uma string está em um formato de data específico.
@@ -96,6 +155,13 @@ def validate_date_format(date_str: str, format_str: str) -> bool:
         return False
 
 
+# Formato numérico brasileiro: 1.234,56 / 1234,56 / 1234. Compilado uma vez,
+# com grupo não-capturante e fullmatch (as âncoras ^/$ por alternativa saem)
+_BR_NUMERIC_FULLMATCH = re.compile(
+    r'-?\d{1,3}(?:\.\d{3})*,\d{2}|-?\d+,\d{2}|-?\d+'
+).fullmatch
+
+
 def validate_numeric_field(value: str, allow_empty: bool = True) -> bool:
     """
     Valida se um campo contém um valor numérico válido no formato brasileiro.
@@ -115,10 +181,8 @@ def validate_numeric_field(value: str, allow_empty: bool = True) -> bool:
     """
     if not value or not value.strip():
         return allow_empty
-    
-    # Formato brasileiro: 1.234,56 ou 1234,56
-    pattern = r'^-?\d{1,3}(\.\d{3})*,\d{2}$|^-?\d+,\d{2}$|^-?\d+$'
-    return bool(re.match(pattern, value.strip()))
+
+    return bool(_BR_NUMERIC_FULLMATCH(value.strip()))
 
 
 # Campos obrigatórios por tipo de registro
@@ -172,6 +236,35 @@ def validate_registro(registro: str, fields: Dict[str, str], strict: bool = Fals
     return missing_fields
 
 
+def validate_registro_frame(registro: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Verifica campos obrigatórios de um DataFrame inteiro de uma vez.
+
+    Versão coluna-a-coluna de validate_registro: em vez de montar um
+    dicionário por linha, calcula a ausência (NaN ou string em branco) de
+    cada campo obrigatório em operações vetorizadas.
+
+    Args:
+        registro: Código do registro (ex: 'C100')
+        df: DataFrame com as linhas daquele registro
+
+    Returns:
+        DataFrame booleano (linhas x campos obrigatórios presentes no df);
+        True indica campo obrigatório vazio naquela linha
+
+    Example:
+        >>> missing = validate_registro_frame('C100', df_c100)
+        >>> linhas_incompletas = missing.any(axis=1).sum()
+    """
+    required = [c for c in REQUIRED_FIELDS.get(registro, []) if c in df.columns]
+    if not required or df.empty:
+        return pd.DataFrame(index=df.index, columns=required, dtype=bool)
+
+    block = df[required]
+    blank = block.astype(str).apply(lambda col: col.str.strip()).eq('')
+    return block.isna() | blank
+
+
 def validate_cross_reference_totals(
     parent_df: pd.DataFrame,
     child_df: pd.DataFrame,
@@ -212,29 +305,27 @@ def validate_cross_reference_totals(
     
     # Agrupa filhos por índice do pai
     child_totals = child_df.groupby(parent_index)[child_value_col].sum()
-    
-    divergencias = []
-    for idx, row in parent_df.iterrows():
-        parent_idx_value = row[parent_index]
-        parent_total = row[parent_total_col]
-        
-        if pd.isna(parent_total):
-            continue
-        
-        child_total = child_totals.get(parent_idx_value, 0)
-        
-        diff = abs(parent_total - child_total)
-        if diff > tolerance:
-            divergencias.append({
-                'index': parent_idx_value,
-                'parent_total': parent_total,
-                'child_total': child_total,
-                'difference': diff,
-                'registro_pai': row.get('REG', 'Unknown'),
-                'num_doc': row.get('NUM_DOC', 'Unknown')
-            })
-    
-    return divergencias
+
+    # Comparação vetorizada: map alinha os totais dos filhos aos pais e a
+    # diferença sai em um passe, sem materializar uma Series por linha
+    # como o iterrows fazia
+    parent_total = parent_df[parent_total_col]
+    child_total = parent_df[parent_index].map(child_totals).fillna(0)
+    difference = (parent_total - child_total).abs()
+    mask = parent_total.notna() & (difference > tolerance)
+
+    if not mask.any():
+        return []
+
+    report = pd.DataFrame({
+        'index': parent_df.loc[mask, parent_index],
+        'parent_total': parent_total[mask],
+        'child_total': child_total[mask],
+        'difference': difference[mask],
+        'registro_pai': parent_df.loc[mask, 'REG'] if 'REG' in parent_df.columns else 'Unknown',
+        'num_doc': parent_df.loc[mask, 'NUM_DOC'] if 'NUM_DOC' in parent_df.columns else 'Unknown',
+    })
+    return report.to_dict('records')
 
 
 def validate_chave_nfe(chave: str) -> bool:
@@ -256,8 +347,11 @@ def validate_chave_nfe(chave: str) -> bool:
     if not chave or not chave.strip():
         return True  # Chaves vazias são permitidas
     
-    # Remove espaços e caracteres não numéricos
-    chave = re.sub(r'[^0-9]', '', chave)
+    # Remove espaços e caracteres não numéricos (fallback raro para regex
+    # se sobrar algo fora do ASCII)
+    chave = chave.translate(_NON_DIGITS)
+    if chave and not chave.isascii():
+        chave = re.sub(r'[^0-9]', '', chave)
     
     # Deve ter exatamente 44 dígitos
     return len(chave) == 44